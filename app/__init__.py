@@ -3,16 +3,75 @@ import os
 from flask import Flask
 from . import db
 from . import blueprints
+from . import commands
+# Aliased, importing the app.auth blueprint package rebinds app.auth
+from .middleware import auth as auth_middleware, compression, profiling, metrics
+from .services import password
 from .utils.errors import register_errors
+from .utils.json_provider import OrJSONProvider
 from flask_cors import CORS
 
 
 def create_app(test_config=None):
     # create and configure the app
     app = Flask(__name__, instance_relative_config=True)
+    # orjson when it's installed, the json module otherwise
+    app.json = OrJSONProvider(app)
     app.config.from_mapping(
         SECRET_KEY='dev',
         DATABASE=os.path.join(app.instance_path, 'server.db'),
+        # Reuses pooled sqlite connections instead of opening one per request
+        SQLITE_PERSISTENT_CONNECTIONS=True,
+        # Idle connections kept open by each pool, extra ones are closed when released
+        SQLITE_POOL_SIZE=8,
+        SQLITE_JOURNAL_MODE='WAL',
+        SQLITE_SYNCHRONOUS='NORMAL',
+        # Negative cache_size is in KiB
+        SQLITE_CACHE_SIZE=-16000,
+        SQLITE_MMAP_SIZE=64 * 1024 * 1024,
+        SQLITE_BUSY_TIMEOUT=5000,
+        # GET routes and validation reads use a separate pool of read-only connections
+        SQLITE_READ_ONLY_CONNECTIONS=True,
+        # Prepared statements kept per connection, sized for every listing filter and projection in use
+        SQLITE_CACHED_STATEMENTS=256,
+        JWT_SECRET=os.environ.get('JWT_SECRET'),
+        # Max number of verified tokens kept in memory, 0 disables the cache
+        JWT_CACHE_SIZE=1024,
+        # werkzeug generate_password_hash method, the iterations set the hashing cost
+        PASSWORD_HASH_METHOD='pbkdf2:sha256:260000',
+        PASSWORD_SALT_LENGTH=16,
+        # Threads hashing passwords, and logins allowed to wait for one before answering 503
+        PASSWORD_HASH_WORKERS=4,
+        PASSWORD_HASH_QUEUE_SIZE=16,
+        # Length of an appointment in minutes, used for doctor's overlapping checks
+        APPOINTMENT_DURATION=30,
+        # Max number of days of a single doctor availability search
+        AVAILABILITY_MAX_DAYS=62,
+        # Max number of days of a single auto-assignment
+        AUTO_ASSIGN_MAX_DAYS=31,
+        # Cold storage of past appointments, filled by the archive-appointments command
+        ARCHIVE_DATABASE=os.path.join(app.instance_path, 'archive.db'),
+        ARCHIVE_AFTER_DAYS=365,
+        ARCHIVE_BATCH_SIZE=5000,
+        # Max number of appointments of a single POST /appointments/bulk
+        BULK_MAX_APPOINTMENTS=1000,
+        # Records every sql statement of a sample of the requests
+        PROFILE_ENABLED=True,
+        PROFILE_SAMPLE_RATE=0.05,
+        # Sampled requests slower than this are logged with their query breakdown
+        PROFILE_SLOW_REQUEST_MS=200,
+        # Same statement executed this many times in a request is flagged as N+1
+        PROFILE_N_PLUS_ONE_THRESHOLD=10,
+        # Collects the request, database and validation metrics served on /metrics
+        METRICS_ENABLED=True,
+        # gzip, or brotli when installed, for clients sending Accept-Encoding
+        COMPRESSION_ENABLED=True,
+        # Buffered bodies below this many bytes are not worth the CPU, streamed ones are always compressed
+        COMPRESSION_MIN_SIZE=1024,
+        # gzip level 1-9, brotli quality 0-11
+        COMPRESSION_LEVELS={'gzip': 6, 'br': 4},
+        # Levels overridden per endpoint, e.g. {'appointments.get_appointments': {'gzip': 9}}
+        COMPRESSION_ENDPOINT_LEVELS={},
     )
 
     if test_config is None:
@@ -29,6 +88,12 @@ def create_app(test_config=None):
         pass
 
     db.init_app(app)
+    # First registered after_request handler runs last, on the final body
+    compression.init_app(app)
+    auth_middleware.init_app(app)
+    password.init_app(app)
+    profiling.init_app(app)
+    metrics.init_app(app)
 
     CORS(app)
 
@@ -37,4 +102,6 @@ def create_app(test_config=None):
 
     register_errors(app)
 
+    commands.register_commands(app)
+
     return app
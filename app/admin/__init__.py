@@ -1,8 +1,14 @@
 from flask import Blueprint, request, jsonify, g
-from app.db import get_db
+from app.db import get_db, get_read_db
+from app.repositories import UserRepository, USERS_SORT_KEYS
 from .validation import validate_user_data
-from app.services.user import get_user_data
+from app.services.password import get_password_hasher
+from app.services.user import get_user_data, USER_FIELDS
 from app.middleware.auth import token_required
+from app.utils.columnar import wants_columnar, fetch_tuples, to_columnar
+from app.utils.fields import get_fields
+from app.utils.etag import get_etag, not_modified, with_etag
+from app.utils.pagination import get_page_limit, parse_bool_arg, paginate
 
 
 bp_routers = Blueprint('admin', __name__)
@@ -12,7 +18,14 @@ bp_routers = Blueprint('admin', __name__)
 @token_required
 def get_users():
     """
-        For getting all users
+        For getting all users, sorted by id
+        args: limit, after, format, fields
+        limit: Page size, max of 500
+        after: next_cursor returned by the previous page
+        format: rows (default) or columnar, column names once and one array of values per column
+        fields: Comma separated columns to return, all but password by default, id is always returned
+
+        filters: level_id, status
     """
     # This route only for admin
     if g.auth_data['level_id'] != 3:
@@ -21,16 +34,39 @@ def get_users():
             'message': 'UnAuthorized user'
         }), 401
 
-    cursor = get_db().cursor()
-    query = "SELECT * FROM user"
-    results = cursor.execute(query).fetchall()
-    results = [dict(row) for row in results]
+    args = request.args
+    limit = get_page_limit(args)
+    columnar = wants_columnar(args)
+    fields = get_fields(args, USER_FIELDS, USER_FIELDS, required=USERS_SORT_KEYS)
+    filters = {
+        'level_id': args.get("level_id", default=None, type=int),
+        'status': parse_bool_arg(args.get("status", default=None, type=str)),
+    }
+    db = get_read_db()
+    # Unchanged users since the client's last read
+    etag = get_etag(db, 'user')
+    response = not_modified(etag)
+    if response is not None:
+        return response
+
+    repository = UserRepository(db)
+    after = args.get("after", default=None, type=str)
+    # Fetching one extra row to know if there's a next page
+    if columnar:
+        query, params = repository.list_query(filters, after, limit + 1, fields)
+        columns, results = fetch_tuples(db.cursor(), query, params)
+        results, next_cursor = paginate(results, limit, USERS_SORT_KEYS, columns)
+        results = to_columnar(columns, results)
+    else:
+        results = repository.list(filters, after, limit + 1, fields).fetchall()
+        results, next_cursor = paginate(results, limit, USERS_SORT_KEYS)
 
-    return jsonify({
+    return with_etag(jsonify({
         'data': results,
+        'next_cursor': next_cursor,
         'status': 'OK',
         'message': 'Successfully retrieve users data'
-    }), 200
+    }), etag), 200
 
 
 @bp_routers.route("/user", methods=['POST'])
@@ -48,7 +84,6 @@ def create_user():
 
     data = request.get_json()
     db = get_db()
-    cursor = db.cursor()
     validation_results = validate_user_data(data)
     if validation_results:
         return jsonify({
@@ -61,10 +96,8 @@ def create_user():
     data.setdefault('status', False)
 
     try:
-        query = "INSERT INTO user (username, password, level_id, email, fullName, status) " \
-                "VALUES (?, ?, ?, ?, ?, ?)"
-        cursor.execute(query, (data["username"], data["password"], data["level_id"],
-                               data["email"], data["full_name"], data["status"]))
+        UserRepository(db).create(data["username"], get_password_hasher().hash_password(data["password"]),
+                                  data["level_id"], data["email"], data["full_name"], data["status"])
         db.commit()
 
     except db.IntegrityError:
@@ -98,8 +131,7 @@ def update_user(user_id):
     data = request.get_json()
     data['user_id'] = user_id
     db = get_db()
-    cursor = db.cursor()
-    user_data = get_user_data(db, user_id)
+    user_data = get_user_data(get_read_db(), user_id, fields=USER_FIELDS + ('password',))
     if user_data is None:
         return jsonify({
             'data': data,
@@ -107,14 +139,15 @@ def update_user(user_id):
             'message': f"User with userId {user_id} not exists"
         }), 404
 
+    # Keeping the stored hash unless a new password is passed
+    password_changed = 'password' in data
     # Overriding un-filled fields
-    data.setdefault('username', user_data['username'])
-    # TODO: Add hash encryption for password
-    data.setdefault('password', user_data['password'])
-    data.setdefault('level_id', user_data['level_id'])
-    data.setdefault('email', user_data['email'])
-    data.setdefault('fullName', user_data['fullName'])
-    data.setdefault('status', user_data['status'])
+    data.setdefault('username', user_data.username)
+    data.setdefault('password', user_data.password)
+    data.setdefault('level_id', user_data.level_id)
+    data.setdefault('email', user_data.email)
+    data.setdefault('fullName', user_data.fullName)
+    data.setdefault('status', user_data.status)
 
     # To cater sqlite conversion of boolean: True - 1, False - 0
     if data['status'] == 0:
@@ -131,11 +164,14 @@ def update_user(user_id):
             'message': validation_results
         }), 404
 
+    if password_changed:
+        password = get_password_hasher().hash_password(data["password"])
+    else:
+        password = user_data.password
+
     try:
-        query = "INSERT INTO user (username, password, level_id, email, fullName, status) " \
-                "VALUES (?, ?, ?, ?, ?, ?)"
-        cursor.execute(query, (data["username"], data["password"], data["level_id"],
-                               data["email"], data["full_name"], data["status"]))
+        UserRepository(db).update(user_id, data["username"], password, data["level_id"],
+                                  data["email"], data["full_name"], data["status"])
         db.commit()
 
     except db.IntegrityError:
@@ -166,8 +202,7 @@ def delete_user(user_id):
         }), 401
 
     db = get_db()
-    cursor = db.cursor()
-    user_data = get_user_data(db, user_id)
+    user_data = get_user_data(get_read_db(), user_id, fields=('id',))
     if user_data is None:
         return jsonify({
             'data': {'id': user_id},
@@ -175,8 +210,7 @@ def delete_user(user_id):
             'message': f"User with userId {user_id} not exists"
         }), 404
 
-    delete_query = "DELETE FROM user WHERE id=?"
-    cursor.execute(delete_query, user_id)
+    UserRepository(db).delete(user_id)
     db.commit()
 
     return jsonify({
@@ -1,44 +1,46 @@
-from jsonschema import validate, ValidationError
+from app.utils.metrics import count_validation_failures
+from app.utils.schema import register_schema, get_schema_error
 
 
-def validate_user_data(data):
-    user_schema = {
-        "type": "object",
-        "properties": {
-            "username": {
-                "type": "string",
-                "error_msg": "username must be text"
-            },
-            "password": {
-                "type": "string",
-                "error_msg": "password must be text"
-            },
-            # TODO: Add validation for id > 3, 1 - scheduler, 2 - doctor, 3 - admin
-            "level_id": {
-                "type": "number",
-                "error_msg": "level_id must be number"
-            },
-            # TODO: Add validation for .com
-            "email": {
-                "type": "string",
-                "error_msg": "email must be text"
-            },
-            "fullName": {
-                "type": "string",
-                "error_msg": "fullName must be text"
-            },
-            "status": {
-                "type": "boolean",
-                "error_msg": "status must be boolean"
-            },
+USER_SCHEMA = register_schema('admin.user', {
+    "type": "object",
+    "properties": {
+        "username": {
+            "type": "string",
+            "error_msg": "username must be text"
+        },
+        "password": {
+            "type": "string",
+            "error_msg": "password must be text"
+        },
+        # TODO: Add validation for id > 3, 1 - scheduler, 2 - doctor, 3 - admin
+        "level_id": {
+            "type": "number",
+            "error_msg": "level_id must be number"
+        },
+        # TODO: Add validation for .com
+        "email": {
+            "type": "string",
+            "error_msg": "email must be text"
         },
-        "required": ["username", "password", "level_id", "email", "full_name"],
-    }
+        "fullName": {
+            "type": "string",
+            "error_msg": "fullName must be text"
+        },
+        "status": {
+            "type": "boolean",
+            "error_msg": "status must be boolean"
+        },
+    },
+    "required": ["username", "password", "level_id", "email", "full_name"],
+})
 
-    try:
-        validate(instance=data, schema=user_schema)
-    except ValidationError as err:
-        return err.schema["error_msg"] if "error_msg" in err.schema else err.message
+
+@count_validation_failures
+def validate_user_data(data):
+    error_msg = get_schema_error('admin.user', data)
+    if error_msg is not None:
+        return error_msg
 
     return
 
@@ -1,12 +1,22 @@
-from flask import Blueprint, request, jsonify, g
-from app.db import get_db
+from flask import Blueprint, request, jsonify, g, current_app
+from app.db import get_db, get_read_db
+from app.repositories import AppointmentRepository, UserRepository, APPOINTMENTS_SORT_KEYS
 from app.middleware.auth import token_required
-from app.services.appointment import get_appointment_data, get_curr_total_accepted_appointments
-from app.services.user import get_user_data, get_doctor_curr_total_appointments, \
-    get_doctor_curr_total_accepted_appointments
-from .controller import get_doctor_appointments_query, get_appointments_query
+from app.services.assignment import auto_assign_appointments
+from app.services.availability import get_doctor_free_slots
+from app.services.booking import book_appointment, assign_appointment_doctor, accept_appointment, \
+    reschedule_appointment
+from app.utils.errors import BookingError, InvalidBodyError
+from app.services.appointment import get_appointment_data, APPOINTMENT_FIELDS, APPOINTMENT_LIST_FIELDS
+from app.services.user import get_user_data
+from app.utils.columnar import wants_columnar, fetch_tuples, to_columnar
+from app.utils.fields import get_fields
+from app.utils.etag import get_etag, not_modified, with_etag
+from app.utils.pagination import get_page_limit, parse_bool_arg, paginate
+from app.utils.streaming import wants_stream, stream_ndjson
+from .bulk import create_appointments
 from .validation import *
-import copy
+from datetime import date, timedelta
 
 bp_routers = Blueprint('appointments', __name__)
 
@@ -16,15 +26,19 @@ bp_routers = Blueprint('appointments', __name__)
 def get_appointment():
     """
         For getting appointment details
-        args: appointment_id, doctor_id
+        args: appointment_id, doctor_id, fields
         doctor_id: Appointment details for this specific doctor
+        fields: Comma separated columns to return, all by default, id and doctor_id are always returned
     """
-    db = get_db()
+    db = get_read_db()
     args = request.args
     appointment_id = args.get("appointment_id", default=None, type=int)
     doctor_id = args.get("doctor_id", default=None, type=int)
+    fields = get_fields(args, APPOINTMENT_FIELDS, APPOINTMENT_FIELDS, required=('id', 'doctor_id'))
 
-    appointment_data = get_appointment_data(db, appointment_id)
+    # Read before the row, a concurrent write can only make the ETag older than the data
+    etag = get_etag(db, 'appointments')
+    appointment_data = get_appointment_data(db, appointment_id, fields=fields)
     if appointment_data is None:
         return jsonify({
             'data': {'appointment_id': appointment_id},
@@ -35,7 +49,7 @@ def get_appointment():
     # For doctors this route is not available
     # if the login doctor id and passed doctor_id not matched
     if doctor_id is not None:
-        if appointment_data['doctor_id'] != doctor_id:
+        if appointment_data.doctor_id != doctor_id:
             return jsonify({
                 'data': {
                     'appointment_id': appointment_id,
@@ -52,37 +66,60 @@ def get_appointment():
                 'message': 'UnAuthorized user'
             }), 401
 
-    return jsonify({
-        'data': dict(appointment_data),
+    # Unchanged appointments since the client's last read, only once the caller may see it
+    response = not_modified(etag)
+    if response is not None:
+        return response
+
+    return with_etag(jsonify({
+        'data': appointment_data,
         'status': 'OK',
         'message': 'Successfully retrieve appointment data'
-    }), 200
+    }), etag), 200
 
 
 @bp_routers.route("/appointments", methods=['GET'])
 @token_required
 def get_appointments():
     """
-        For Getting List of Appointments
-        args: doctor_id
+        For Getting List of Appointments, sorted by schedule_time
+        args: doctor_id, limit, after, format, fields
         doctor_id: List of available appointments for this specific doctor
-
-        filters: date
+        limit: Page size, max of 500
+        after: next_cursor returned by the previous page
+        stream: Streams every matching row as NDJSON, ignores limit
+                also enabled by Accept: application/x-ndjson
+        format: rows (default) or columnar, column names once and one array of values per column
+        fields: Comma separated columns to return, all but comments by default,
+                schedule_time and id are always returned
+
+        filters: date, date_from, date_to in YYYY-MM-DD format, is_accepted, patient_name
     """
-    db = get_db()
-    cursor = get_db().cursor()
+    db = get_read_db()
     args = request.args
     doctor_id = args.get("doctor_id", default=None, type=int)
-    date = args.get("date", default=None, type=str)
-    query = get_appointments_query(date)
+    limit = get_page_limit(args)
+    filters = {
+        'date': parse_date_arg(args, "date", None),
+        'date_from': parse_date_arg(args, "date_from", None),
+        'date_to': parse_date_arg(args, "date_to", None),
+        'doctor_id': doctor_id,
+        'is_accepted': parse_bool_arg(args.get("is_accepted", default=None, type=str)),
+        'patient_name': args.get("patient_name", default=None, type=str),
+    }
+    columnar = wants_columnar(args)
+    fields = get_fields(args, APPOINTMENT_FIELDS, APPOINTMENT_LIST_FIELDS, required=APPOINTMENTS_SORT_KEYS)
+    stream = wants_stream()
+    if not stream:
+        # Read before the doctor check and the rows, a concurrent write can only make it older than the data
+        etag = get_etag(db, 'appointments', 'user') if doctor_id is not None else get_etag(db, 'appointments')
     if doctor_id is not None:
-        if get_user_data(db, doctor_id) is None:
+        if get_user_data(db, doctor_id, fields=('id',)) is None:
             return jsonify({
                 'data': {'doctor_id': doctor_id},
                 'status': 'Fail',
                 'message': f"Doctor {doctor_id} not exists"
             }), 404
-        query = get_doctor_appointments_query(doctor_id)
     else:
         # For login doctor and no passed doctor_id
         if g.auth_data['level_id'] == 2:
@@ -91,13 +128,88 @@ def get_appointments():
                 'message': 'UnAuthorized user'
             }), 401
 
-    appointments = cursor.execute(query).fetchall()
-    appointments = [dict(row) for row in appointments]
+    after = args.get("after", default=None, type=str)
+    repository = AppointmentRepository(db)
+    if stream:
+        return stream_ndjson(repository.list(filters, after, fields=fields))
+
+    # Unchanged appointments, and doctor when filtered by doctor, since the client's last read
+    response = not_modified(etag)
+    if response is not None:
+        return response
+
+    # Fetching one extra row to know if there's a next page
+    if columnar:
+        query, params = repository.list_query(filters, after, limit + 1, fields)
+        columns, appointments = fetch_tuples(db.cursor(), query, params)
+        appointments, next_cursor = paginate(appointments, limit, APPOINTMENTS_SORT_KEYS, columns)
+        appointments = to_columnar(columns, appointments)
+    else:
+        appointments = repository.list(filters, after, limit + 1, fields).fetchall()
+        appointments, next_cursor = paginate(appointments, limit, APPOINTMENTS_SORT_KEYS)
 
-    return jsonify({
+    return with_etag(jsonify({
         'data': appointments,
+        'next_cursor': next_cursor,
         'status': 'OK',
         'message': 'Successfully retrieve appointments data'
+    }), etag), 200
+
+
+def parse_date_arg(args, name, default):
+    value = args.get(name, default=None, type=str)
+    if value is None:
+        return default
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise InvalidBodyError(f"{name} must be a date in YYYY-MM-DD format")
+
+
+@bp_routers.route("/doctors/<int:doctor_id>/availability", methods=['GET'])
+@token_required
+def get_doctor_availability(doctor_id):
+    """
+        For getting the free slots of a doctor within the opening schedule
+        args: from, to, duration
+        from: First date of the range (YYYY-MM-DD), defaults to today
+        to: Last date of the range, defaults to a week from the first date
+        duration: Slot length in minutes, defaults to the appointment duration,
+                  slots start one appointment apart and end by the closing time
+    """
+    db = get_read_db()
+    args = request.args
+    date_from = parse_date_arg(args, "from", date.today())
+    date_to = parse_date_arg(args, "to", date_from + timedelta(days=6))
+    duration = args.get("duration", default=current_app.config['APPOINTMENT_DURATION'], type=int)
+    max_days = current_app.config['AVAILABILITY_MAX_DAYS']
+    if duration < 1:
+        raise InvalidBodyError("duration must be a positive number")
+    if date_to < date_from:
+        raise InvalidBodyError("to must not be before from")
+    if (date_to - date_from).days >= max_days:
+        raise InvalidBodyError(f"Cannot search more than {max_days} days at once")
+
+    validation_results = validate_doctor_status(db, doctor_id)
+    if validation_results is not None:
+        return jsonify({
+            'data': {'doctor_id': doctor_id},
+            'status': 'Fail',
+            'message': validation_results
+        }), 404
+
+    slots = get_doctor_free_slots(db, doctor_id, date_from, date_to, duration)
+
+    return jsonify({
+        'data': {
+            'doctor_id': doctor_id,
+            'from': date_from.isoformat(),
+            'to': date_to.isoformat(),
+            'duration': duration,
+            'slots': [{'start': start.isoformat() + 'Z', 'end': end.isoformat() + 'Z'} for start, end in slots],
+        },
+        'status': 'OK',
+        'message': 'Successfully retrieve doctor availability'
     }), 200
 
 
@@ -115,8 +227,6 @@ def create_appointment():
         }), 401
 
     data = request.get_json()
-    db = get_db()
-    cursor = db.cursor()
     validation_results = validate_appointment_data(data)
     if validation_results is not None:
         return jsonify({
@@ -135,43 +245,16 @@ def create_appointment():
             'message': 'Appointment schedule is not within opening schedule Monday-Saturday (9AM-5PM) & not in the past'
 
         }), 404
-    # Checking if patient's appointment not overlapping
-    validation_results = validate_patient_appointments_schedule(db, data["patient_name"], data["schedule_time"])
-    if validation_results is not None:
+
+    # Patient, doctor and capacity checks run with the insert in one transaction
+    try:
+        book_appointment(get_db(), data)
+    except BookingError as err:
         return jsonify({
             'data': data,
             'status': 'Fail',
-            'message': validation_results
-        }), 404
-
-    if data['doctor_id'] is not None:
-        # Checking if doctor exists and available
-        validation_results = validate_doctor_status(db, data["doctor_id"])
-        if validation_results is not None:
-            return jsonify({
-                'data': data,
-                'status': 'Fail',
-                'message': validation_results
-            }), 404
-        # Checking if doctor's appointments not overlapping
-        validation_results = validate_doctor_appointments_schedule(db, data["doctor_id"], data["schedule_time"])
-        if validation_results is not None:
-            return jsonify({
-                'data': data,
-                'status': 'Fail',
-                'message': validation_results
-            }), 404
-        # Checking if doctor is over-booked
-        if get_doctor_curr_total_appointments(db) > 5:
-            return jsonify({
-                'data': data,
-                'status': 'Fail',
-                'message': 'The doctor is currently over-booked'
-            }), 404
-
-    query = "INSERT INTO appointments (patient_name, schedule_time, doctor_id) VALUES (?, ?, ?)"
-    cursor.execute(query, (data["patient_name"], data["schedule_time"], data["doctor_id"]))
-    db.commit()
+            'message': err.error
+        }), err.status_code
 
     return jsonify({
             'data': data,
@@ -180,6 +263,91 @@ def create_appointment():
         }), 200
 
 
+@bp_routers.route("/appointments/bulk", methods=['POST'])
+@token_required
+def create_appointments_bulk():
+    """
+        For creating a batch of appointments in a single transaction
+        Uses the same checks as creating an appointment, including conflicts
+        between appointments of the same batch
+        Valid appointments are created, results are reported per appointment
+    """
+    # This route is not available for doctor
+    if g.auth_data['level_id'] == 2:
+        return jsonify({
+            'status': 'Fail',
+            'message': 'UnAuthorized user'
+        }), 401
+
+    data = request.get_json()
+    max_items = current_app.config['BULK_MAX_APPOINTMENTS']
+    if not isinstance(data, list) or not data:
+        return jsonify({
+            'status': 'Fail',
+            'message': 'Payload must be a non empty list of appointments'
+        }), 404
+    if len(data) > max_items:
+        return jsonify({
+            'status': 'Fail',
+            'message': f"Cannot create more than {max_items} appointments at once"
+        }), 404
+
+    results = create_appointments(get_db(), data)
+    total_created = sum(1 for result in results if result['status'] == 'OK')
+
+    return jsonify({
+        'data': results,
+        'status': 'OK',
+        'message': f"Successfully created {total_created} of {len(results)} appointments"
+    }), 200
+
+
+@bp_routers.route("/appointments/auto-assign", methods=['POST'])
+@token_required
+def auto_assign_doctors():
+    """
+        For assigning the unassigned appointments of a date range to the least loaded
+        active doctors, respecting doctors' schedules and daily limit, in a single transaction.
+        Appointments already started are not assigned
+        args: from, to, dry_run
+        from: First date of the range (YYYY-MM-DD), defaults to today
+        to: Last date of the range, defaults to a week from the first date
+        dry_run: Returns the assignments without saving them
+    """
+    # This route is not available for doctor
+    if g.auth_data['level_id'] == 2:
+        return jsonify({
+            'status': 'Fail',
+            'message': 'UnAuthorized user'
+        }), 401
+
+    args = request.args
+    date_from = parse_date_arg(args, "from", date.today())
+    date_to = parse_date_arg(args, "to", date_from + timedelta(days=6))
+    dry_run = parse_bool_arg(args.get("dry_run", default=None, type=str)) or False
+    max_days = current_app.config['AUTO_ASSIGN_MAX_DAYS']
+    if date_to < date_from:
+        raise InvalidBodyError("to must not be before from")
+    if (date_to - date_from).days >= max_days:
+        raise InvalidBodyError(f"Cannot assign more than {max_days} days at once")
+
+    assignments, unassigned = auto_assign_appointments(get_db(), date_from, date_to, dry_run)
+
+    return jsonify({
+        'data': {
+            'assigned': [{
+                'appointment_id': appointment_id,
+                'doctor_id': doctor_id,
+                'schedule_time': schedule_time
+            } for appointment_id, doctor_id, schedule_time in assignments],
+            'unassigned': unassigned,
+            'dry_run': dry_run
+        },
+        'status': 'OK',
+        'message': f"Successfully assigned {len(assignments)} of {len(assignments) + len(unassigned)} appointments"
+    }), 200
+
+
 @bp_routers.route("/appointment/<appointment_id>", methods=['PATCH'])
 @token_required
 def update_appointment(appointment_id):
@@ -195,8 +363,9 @@ def update_appointment(appointment_id):
         }), 401
     data = request.get_json()
     db = get_db()
-    cursor = db.cursor()
-    appointment_data = get_appointment_data(db, appointment_id)
+    read_db = get_read_db()
+    appointment_data = get_appointment_data(read_db, appointment_id, include_archive=False,
+                                            fields=('schedule_time', 'patient_name', 'doctor_id', 'is_accepted'))
     if appointment_data is None:
         return jsonify({
             'data': {'appointment_id': appointment_id},
@@ -205,27 +374,20 @@ def update_appointment(appointment_id):
         }), 404
     # SQLITE3 stores boolean values True: 1, False: 0
     # Cannot update appointment once status is accepted
-    if appointment_data["is_accepted"] == 1:
+    if appointment_data.is_accepted == 1:
         return jsonify({
             'data': {'appointment_id': appointment_id},
             'status': 'Fail',
             'message': f"Cannot Update Accepted Appointments"
         }), 404
 
-    data.setdefault('schedule_time', appointment_data["schedule_time"])
-    data.setdefault('patient_name', appointment_data["patient_name"])
-    data.setdefault('doctor_id', appointment_data["doctor_id"])
-    data.setdefault('is_accepted', appointment_data["is_accepted"])
+    data.setdefault('schedule_time', appointment_data.schedule_time)
+    data.setdefault('patient_name', appointment_data.patient_name)
+    data.setdefault('doctor_id', appointment_data.doctor_id)
+    data.setdefault('is_accepted', appointment_data.is_accepted)
     # Cater sqlite conversion of boolean, 1 - True, 2 - False
     if data["is_accepted"] == 1:
         data["is_accepted"] = True
-        # Checking of total accepted appointments limit, 5
-        if get_curr_total_accepted_appointments(db) > 5:
-            return jsonify({
-                'data': data,
-                'status': 'Fail',
-                'message': "Appointment acceptance limit"
-            }), 404
         # Checking if there's assigned doctor for accepted order
         if data["doctor_id"] is None:
             return jsonify({
@@ -233,24 +395,10 @@ def update_appointment(appointment_id):
                 'status': 'Fail',
                 'message': "Cannot accepts an appointment without assigned doctor"
             }), 404
-        # Checking if doctor is over-booked
-        if get_doctor_curr_total_appointments(db) > 5:
-            return jsonify({
-                'data': data,
-                'status': 'Fail',
-                'message': 'The doctor is currently over-booked'
-            }), 404
-        # Checking of doctor's total accepted appointments limit, 3
-        if get_doctor_curr_total_accepted_appointments(db, data["doctor_id"]) > 3:
-            return jsonify({
-                'data': data,
-                'status': 'Fail',
-                'message': "Doctor acceptance limit"
-            }), 404
     else:
         data["is_accepted"] = False
-    # Deep copy, to use in updating appointment data
-    _doctor_id = copy.deepcopy(data['doctor_id'])
+    # Kept to use in updating appointment data
+    _doctor_id = data['doctor_id']
     # Deleting of doctor_id if it's none before payload validation
     if data["doctor_id"] is None:
         del data["doctor_id"]
@@ -262,47 +410,25 @@ def update_appointment(appointment_id):
             'status': 'Fail',
             'message': validation_results
         }), 404
-    print(data["schedule_time"])
-    print(appointment_data["schedule_time"])
-    # Rechecking of patients appointments based on schedule time
-    if data["schedule_time"] != appointment_data["schedule_time"]:
-        # Checking if appointment schedule is within opening hours
-        if not validate_appointment_schedule(data["schedule_time"], update_flag=False):
-            return jsonify({
-                'data': data,
-                'status': 'Fail',
-                'message': 'Appointment schedule is not within opening schedule Monday-Saturday (9AM-5PM)'
-            }), 404
-        validation_results = validate_patient_appointments_schedule(db, data["patient_name"], data["schedule_time"])
-        if validation_results is not None:
-            return jsonify({
-                'data': data,
-                'status': 'Fail',
-                'message': validation_results
-            }), 404
-        # Rechecking of doctors appointments based on schedule time
-        if data['doctor_id'] is not None:
-            validation_results = validate_doctor_status(db, data["doctor_id"])
-            if validation_results is not None:
-                return jsonify({
-                    'data': data,
-                    'status': 'Fail',
-                    'message': validation_results
-                }), 404
-            validation_results = validate_doctor_appointments_schedule(db, data["doctor_id"], data["schedule_time"])
-            if validation_results is not None:
-                return jsonify({
-                    'data': data,
-                    'status': 'Fail',
-                    'message': validation_results
-                }), 404
-
-    query = "UPDATE appointments " \
-            "SET schedule_time = ?, patient_name = ? , doctor_id = ?, is_accepted = ?" \
-            "WHERE id = ?"
-    cursor.execute(query, (data["schedule_time"], data["patient_name"], _doctor_id,
-                           data["is_accepted"], appointment_id))
-    db.commit()
+    # Checking if the new appointment schedule is within opening hours
+    if data["schedule_time"] != appointment_data.schedule_time \
+            and not validate_appointment_schedule(data["schedule_time"], update_flag=False):
+        return jsonify({
+            'data': data,
+            'status': 'Fail',
+            'message': 'Appointment schedule is not within opening schedule Monday-Saturday (9AM-5PM)'
+        }), 404
+
+    # Patient, doctor schedule and acceptance limit checks run with the update in one transaction
+    try:
+        reschedule_appointment(db, appointment_id, data["schedule_time"], data["patient_name"], _doctor_id,
+                               data["is_accepted"])
+    except BookingError as err:
+        return jsonify({
+            'data': data,
+            'status': 'Fail',
+            'message': err.error
+        }), err.status_code
 
     return jsonify({
         'data': data,
@@ -324,46 +450,18 @@ def assign_doctor(appointment_id, doctor_id):
             'message': 'UnAuthorized user'
         }), 401
 
-    db = get_db()
-    cursor = db.cursor()
-    appointment_data = get_appointment_data(db, appointment_id)
-    # Checking if appointment exists
-    if appointment_data is None:
+    # Appointment, doctor and capacity checks run with the update in one transaction
+    try:
+        assign_appointment_doctor(get_db(), appointment_id, doctor_id)
+    except BookingError as err:
         return jsonify({
-            'data': {'appointment_id': appointment_id},
-            'status': 'Fail',
-            'message': f"Appointment {appointment_id} not exists"
-        }), 404
-    # Checking if doctor exists and available
-    validation_results = validate_doctor_status(db, doctor_id)
-    if validation_results is not None:
-        return jsonify({
-            'data': {'doctor_id': doctor_id},
-            'status': 'Fail',
-            'message': validation_results
-        }), 404
-    # Checking doctor's appointment based on schedule_time
-    validation_results = validate_doctor_appointments_schedule(db, doctor_id, appointment_data["schedule_time"])
-    if validation_results is not None:
-        return jsonify({
-            'data': {'doctor_id': doctor_id},
-            'status': 'Fail',
-            'message': validation_results
-        }), 404
-    # Checking if doctor is over-booked
-    if get_doctor_curr_total_appointments(db) > 5:
-        return jsonify({
-            'data': {'doctor_id': doctor_id},
+            'data': {
+                'appointment_id': appointment_id,
+                'doctor_id': doctor_id
+            },
             'status': 'Fail',
-            'message': 'The doctor is currently over-booked'
-        }), 404
-
-    query = "UPDATE appointments " \
-            "SET doctor_id = ? "\
-            "WHERE id = ?"
-
-    cursor.execute(query, (doctor_id, appointment_id))
-    db.commit()
+            'message': err.error
+        }), err.status_code
 
     return jsonify({
         'data': {
@@ -389,19 +487,15 @@ def activate_doctor(doctor_id):
         }), 401
 
     db = get_db()
-    cursor = db.cursor()
     # Checking if doctor exists
-    if get_user_data(db, doctor_id) is None:
+    if get_user_data(get_read_db(), doctor_id, fields=('id',)) is None:
         return jsonify({
             'data': {'doctor_id': doctor_id},
             'status': 'Fail',
             'message': f"Doctor {doctor_id} not exists"
         }), 404
 
-    query = "UPDATE user " \
-            "SET status = ? " \
-            "WHERE id = ? "
-    cursor.execute(query, (True, doctor_id))
+    UserRepository(db).set_status(doctor_id, True)
     db.commit()
 
     return jsonify({
@@ -425,19 +519,15 @@ def deactivate_doctor(doctor_id):
         }), 401
 
     db = get_db()
-    cursor = db.cursor()
     # Checking if doctor exists
-    if get_user_data(db, doctor_id) is None:
+    if get_user_data(get_read_db(), doctor_id, fields=('id',)) is None:
         return jsonify({
             'data': {'doctor_id': doctor_id},
             'status': 'Fail',
             'message': f"Doctor {doctor_id} not exists"
         }), 404
 
-    query = "UPDATE user " \
-            "SET status = ? " \
-            "WHERE id = ? "
-    cursor.execute(query, (False, doctor_id))
+    UserRepository(db).set_status(doctor_id, False)
     db.commit()
 
     return jsonify({
@@ -448,6 +538,7 @@ def deactivate_doctor(doctor_id):
 
 
 @bp_routers.route("/doctor/<doctor_id>/accept/<appointment_id>", methods=['PUT'])
+@token_required
 def accepts_appointment(doctor_id, appointment_id):
     """
         For doctor accepting an appointment
@@ -459,54 +550,18 @@ def accepts_appointment(doctor_id, appointment_id):
             'message': 'UnAuthorized user'
         }), 401
 
-    db = get_db()
-    cursor = db.cursor()
-    # Checking if doctor exists and available
-    validation_results = validate_doctor_status(db, doctor_id)
-    if validation_results is not None:
-        return jsonify({
-            'data': {'doctor_id': doctor_id},
-            'status': 'Fail',
-            'message': validation_results
-        }), 404
-    # Checking if doctor that will accepts is assigned to this appointment
-    validation_results = validate_doctor_appointment(db, doctor_id, appointment_id)
-    if validation_results is not None:
-        return jsonify({
-            'data': {
-                'doctor_id': doctor_id,
-                'appointment_id': appointment_id
-            },
-            'status': 'Fail',
-            'message': validation_results
-        }), 404
-    # Checking of total accepted appointments limit, 5
-    if get_curr_total_accepted_appointments(db) > 5:
-        return jsonify({
-            'data': {
-                'appointment_id': appointment_id,
-                'doctor_id': doctor_id
-            },
-            'status': 'Fail',
-            'message': "Appointment acceptance limit"
-        }), 404
-
-    # Checking of doctor's total accepted appointments limit, 3
-    if get_doctor_curr_total_accepted_appointments(db, doctor_id) > 3:
+    # Doctor, assignment and acceptance limits checks run with the update in one transaction
+    try:
+        accept_appointment(get_db(), doctor_id, appointment_id)
+    except BookingError as err:
         return jsonify({
             'data': {
                 'appointment_id': appointment_id,
                 'doctor_id': doctor_id
             },
             'status': 'Fail',
-            'message': "Doctor acceptance limit"
-        }), 404
-
-    query = "UPDATE appointments " \
-            "SET doctor_id = ?, is_accepted = ?" \
-            "WHERE id = ? "
-    cursor.execute(query, (doctor_id, True, appointment_id))
-    db.commit()
+            'message': err.error
+        }), err.status_code
 
     return jsonify({
         'data': {'doctor_id': doctor_id},
@@ -516,6 +571,7 @@ def accepts_appointment(doctor_id, appointment_id):
 
 
 @bp_routers.route("/appointment/findings", methods=['PUT'])
+@token_required
 def set_appointment_findings():
     """
         For doctor accepting an appointment
@@ -528,7 +584,6 @@ def set_appointment_findings():
         }), 401
 
     db = get_db()
-    cursor = get_db().cursor()
     data = request.get_json()
     # Payload validation
     validation_results = validate_appointment_findings_data(data)
@@ -539,7 +594,8 @@ def set_appointment_findings():
             'message': validation_results
         }), 404
     # Checking of appointment data exists
-    appointment_data = get_appointment_data(db, data['appointment_id'])
+    appointment_data = get_appointment_data(get_read_db(), data['appointment_id'], include_archive=False,
+                                            fields=('doctor_id',))
     if appointment_data is None:
         return jsonify({
             'data': {'appointment_id': data['appointment_id']},
@@ -547,7 +603,7 @@ def set_appointment_findings():
             'message': f"Appointment {data['appointment_id']} not exists"
         }), 404
     # Checking of appointment assigned doctor matched passed doctor_id
-    if appointment_data['doctor_id'] != data['doctor_id']:
+    if appointment_data.doctor_id != data['doctor_id']:
         return jsonify({
             'data': {
                 'appointment_id': data['appointment_id'],
@@ -557,10 +613,7 @@ def set_appointment_findings():
             'message': "UnAuthorized Doctor"
         }), 401
 
-    query = "UPDATE appointments " \
-            "SET comments = ? "\
-            "WHERE id = ?"
-    cursor.execute(query, (data['comments'], data['appointment_id']))
+    AppointmentRepository(db).set_comments(data['appointment_id'], data['comments'])
     db.commit()
 
     return jsonify({
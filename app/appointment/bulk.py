@@ -0,0 +1,124 @@
+from datetime import date
+from app.repositories import AppointmentRepository
+from app.services.availability import get_appointment_duration, find_overlap, parse_schedule_time
+from app.utils.metrics import count_capacity_rejection
+from app.services.booking import read_doctor_day, MAX_CURR_TOTAL_APPOINTMENTS
+from app.services.user import get_doctor_curr_total_appointments
+from .validation import validate_appointment_data, validate_appointment_schedule, \
+    validate_patient_appointments_schedule, validate_doctor_status
+
+
+class AppointmentBatch:
+    """
+        Validates a batch of new appointments against the database and
+        against the appointments accepted earlier in the same batch
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.duration = get_appointment_duration()
+        self.today = date.today()
+        self.curr_total_appointments = get_doctor_curr_total_appointments(db)
+        # doctor_id -> validate_doctor_status result
+        self.doctor_status = {}
+        # (doctor_id, day) -> sorted list of (start, end, appointment id, or item position for the batch's ones),
+        # read from the database inside the transaction then extended with the batch
+        self.doctor_intervals = {}
+        self.patient_schedules = set()
+        self.rows = []
+
+    def validate(self, data):
+        """
+            Same checks as create_appointment, returns the error message or None
+        """
+        if not isinstance(data, dict):
+            return "Appointment must be an object"
+        validation_results = validate_appointment_data(data)
+        if validation_results is not None:
+            return validation_results
+        data.setdefault('doctor_id', None)
+
+        # Checking if appointment time is within 9AM - 5PM and not in the past
+        if not validate_appointment_schedule(data["schedule_time"]):
+            return 'Appointment schedule is not within opening schedule Monday-Saturday (9AM-5PM) & not in the past'
+        # Checking if patient's appointment not overlapping
+        patient_schedule = (data["patient_name"], data["schedule_time"])
+        if patient_schedule in self.patient_schedules:
+            return 'Cannot create an appointment, Patient does have existing appointment on the same time'
+        validation_results = validate_patient_appointments_schedule(self.db, *patient_schedule)
+        if validation_results is not None:
+            return validation_results
+
+        start = parse_schedule_time(data["schedule_time"])
+        doctor_id = data['doctor_id']
+        if doctor_id is not None:
+            # Checking if doctor exists and available
+            if doctor_id not in self.doctor_status:
+                self.doctor_status[doctor_id] = validate_doctor_status(self.db, doctor_id)
+            if self.doctor_status[doctor_id] is not None:
+                return self.doctor_status[doctor_id]
+            # Checking if doctor's appointments not overlapping, booked ones and earlier ones of the batch
+            end = start + self.duration
+            if find_overlap(self.get_doctor_intervals(doctor_id, data["schedule_time"]), start, end) is not None:
+                return f'Cannot assign the doctorId: {doctor_id} to an appointment, ' \
+                       'Doctor is not available during this time'
+            # Checking if doctor is over-booked
+            if self.curr_total_appointments > MAX_CURR_TOTAL_APPOINTMENTS:
+                count_capacity_rejection('doctor_over_booked')
+                return 'The doctor is currently over-booked'
+
+        self.add(data, start)
+
+        return None
+
+    def get_doctor_intervals(self, doctor_id, schedule_time):
+        key = (doctor_id, parse_schedule_time(schedule_time).date())
+        if key not in self.doctor_intervals:
+            self.doctor_intervals[key] = read_doctor_day(self.db, doctor_id, schedule_time)
+
+        return self.doctor_intervals[key]
+
+    def add(self, data, start):
+        if data['doctor_id'] is not None:
+            intervals = self.get_doctor_intervals(data['doctor_id'], data["schedule_time"])
+            intervals.append((start, start + self.duration, len(self.rows)))
+            intervals.sort()
+        if start.date() == self.today:
+            self.curr_total_appointments += 1
+        self.patient_schedules.add((data["patient_name"], data["schedule_time"]))
+        self.rows.append((data["patient_name"], data["schedule_time"], data["doctor_id"]))
+
+
+def create_appointments(db, items):
+    """
+        Validates and inserts a batch of appointments in a single transaction
+        Returns the per item results, in the order of items
+    """
+    results = []
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        batch = AppointmentBatch(db)
+        for position, data in enumerate(items):
+            validation_results = batch.validate(data)
+            results.append({
+                'index': position,
+                'data': data,
+                'status': 'Fail' if validation_results is not None else 'OK',
+                'message': validation_results or 'Successfully created appointment'
+            })
+
+        if batch.rows:
+            last_id = AppointmentRepository(db).create_many(batch.rows)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    if batch.rows:
+        appointment_id = last_id - len(batch.rows) + 1
+        for result in results:
+            if result['status'] == 'OK':
+                result['appointment_id'] = appointment_id
+                appointment_id += 1
+
+    return results
@@ -1,8 +1,9 @@
 import datetime
-from flask import Blueprint, request, jsonify
-from app.db import get_db
+from flask import Blueprint, request, jsonify, current_app
+from app.db import get_db, get_read_db
+from app.repositories import UserRepository
+from app.services.password import get_password_hasher
 import jwt
-import os
 
 
 bp_routers = Blueprint('auth', __name__)
@@ -11,18 +12,22 @@ bp_routers = Blueprint('auth', __name__)
 @bp_routers.route("/auth", methods=['POST'])
 def authenticate():
     data = request.get_json()
-    cursor = get_db().cursor()
-    query = "SELECT * FROM user " \
-            "WHERE username = ? " \
-            "AND password = ?"
-    res = cursor.execute(query, (data["username"], data["password"])).fetchone()
-    if res is None:
+    res = UserRepository(get_read_db()).get_by_username(data["username"], fields=('id', 'level_id', 'password'))
+    # Verified on the hashing pool, answers 503 when too many logins are waiting
+    valid, new_hash = get_password_hasher().verify_password(res.password if res is not None else None,
+                                                            data["password"])
+    if not valid:
         return 'Invalid Username and Password', 401
-    secrets = os.environ.get('JWT_SECRET')
+    # Replaces plaintext and outdated hashes on a successful login
+    if new_hash is not None:
+        db = get_db()
+        UserRepository(db).rehash_password(res.id, new_hash, res.password)
+        db.commit()
+    secrets = current_app.config['JWT_SECRET']
 
     encoded_jwt = jwt.encode({
-            'id': res["id"],
-            'level_id': res["level_id"],
+            'id': res.id,
+            'level_id': res.level_id,
             'iat': datetime.datetime.utcnow(),
             'exp': datetime.datetime.utcnow() + datetime.timedelta(minutes=60)
         },
@@ -1,25 +1,27 @@
-from jsonschema import validate, ValidationError
+from app.utils.metrics import count_validation_failures
+from app.utils.schema import register_schema, get_schema_error
 
 
-def validate_user_data(data):
-    schema = {
-        "type": "object",
-        "properties": {
-            "username": {
-                "type": "string",
-                "error_msg": "username must be text"
-            },
-            "password": {
-                "type": "string",
-                "error_msg": "password must be text"
-            },
+USER_SCHEMA = register_schema('auth.user', {
+    "type": "object",
+    "properties": {
+        "username": {
+            "type": "string",
+            "error_msg": "username must be text"
+        },
+        "password": {
+            "type": "string",
+            "error_msg": "password must be text"
         },
-        "required": ["username", "password"],
-    }
+    },
+    "required": ["username", "password"],
+})
 
-    try:
-        validate(instance=data, schema=schema)
-    except ValidationError as err:
-        return err.schema["error_msg"] if "error_msg" in err.schema else err.message
+
+@count_validation_failures
+def validate_user_data(data):
+    error_msg = get_schema_error('auth.user', data)
+    if error_msg is not None:
+        return error_msg
 
     return
@@ -0,0 +1,14 @@
+def register_commands(app):
+    from app.commands.transfer import import_appointments_command, export_appointments_command, \
+        import_users_command, export_users_command
+    from app.commands.seed import seed_db_command
+    from app.commands.assign import auto_assign_command
+    from app.commands.archive import archive_appointments_command
+
+    app.cli.add_command(import_appointments_command)
+    app.cli.add_command(export_appointments_command)
+    app.cli.add_command(import_users_command)
+    app.cli.add_command(export_users_command)
+    app.cli.add_command(seed_db_command)
+    app.cli.add_command(auto_assign_command)
+    app.cli.add_command(archive_appointments_command)
@@ -0,0 +1,19 @@
+from datetime import date, timedelta
+import click
+from flask import current_app
+from app.db import get_db
+from app.services.archive import archive_appointments, get_archive_path
+
+
+@click.command('archive-appointments')
+@click.option('--before', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Archive appointments scheduled before this date, defaults to ARCHIVE_AFTER_DAYS ago.')
+@click.option('--batch-size', type=click.IntRange(min=1), default=None,
+              help='Rows moved per transaction, defaults to ARCHIVE_BATCH_SIZE.')
+def archive_appointments_command(before, batch_size):
+    """Move past appointments into the archive database."""
+    config = current_app.config
+    cutoff = before.date() if before is not None else date.today() - timedelta(days=config['ARCHIVE_AFTER_DAYS'])
+    db = get_db()
+    total = archive_appointments(db, cutoff, batch_size or config['ARCHIVE_BATCH_SIZE'])
+    click.echo(f'Archived {total} appointments scheduled before {cutoff} into {get_archive_path()}.')
@@ -0,0 +1,28 @@
+from datetime import date, timedelta
+import click
+from flask import current_app
+from app.db import get_db
+from app.services.assignment import auto_assign_appointments
+
+
+@click.command('auto-assign')
+@click.option('--from', 'date_from', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='First date of the range, defaults to today.')
+@click.option('--to', 'date_to', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Last date of the range, defaults to a week from the first date.')
+@click.option('--dry-run', is_flag=True, help='Print the assignments without saving them.')
+def auto_assign_command(date_from, date_to, dry_run):
+    """Assign the unassigned appointments to the least loaded active doctors."""
+    date_from = date_from.date() if date_from is not None else date.today()
+    date_to = date_to.date() if date_to is not None else date_from + timedelta(days=6)
+    if date_to < date_from:
+        raise click.BadParameter('must not be before --from', param_hint='--to')
+    max_days = current_app.config['AUTO_ASSIGN_MAX_DAYS']
+    if (date_to - date_from).days >= max_days:
+        raise click.BadParameter(f'cannot be more than {max_days} days after --from', param_hint='--to')
+
+    assignments, unassigned = auto_assign_appointments(get_db(), date_from, date_to, dry_run)
+    for appointment_id, doctor_id, schedule_time in assignments:
+        click.echo(f'{schedule_time} appointment {appointment_id} -> doctor {doctor_id}')
+    action = 'Would assign' if dry_run else 'Assigned'
+    click.echo(f'{action} {len(assignments)} appointments, {len(unassigned)} left unassigned.')
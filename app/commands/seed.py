@@ -0,0 +1,92 @@
+import random
+from datetime import date, datetime, timedelta
+import click
+from flask import current_app
+from app.db import get_db, init_db
+from app.commands.transfer import import_records
+from app.repositories import AppointmentRepository, UserRepository
+from app.services.availability import OPENING_TIME, LAST_START_TIME, is_open
+
+
+def get_day_slots(duration):
+    """
+        Returns every appointment start time within the opening hours
+    """
+    slots = []
+    slot = datetime.combine(date.min, OPENING_TIME)
+    while slot.time() <= LAST_START_TIME:
+        slots.append(slot.time())
+        slot += timedelta(minutes=duration)
+
+    return slots
+
+
+def generate_users(prefix, level_id, total):
+    for number in range(1, total + 1):
+        username = f'{prefix}{number}'
+        yield {
+            'username': username,
+            'password': username,
+            'level_id': level_id,
+            'email': f'{username}@seed.local',
+            'fullName': f'Seed {prefix.title()} {number}',
+            'status': True,
+        }
+
+
+def generate_appointments(rng, doctor_ids, start_day, end_day, per_day, unassigned_ratio, accepted_ratio):
+    """
+        Yields appointments for every opening day, Monday-Saturday, from start_day to end_day.
+        Each doctor gets up to per_day non overlapping appointments a day
+    """
+    slots = get_day_slots(current_app.config['APPOINTMENT_DURATION'])
+    today = date.today()
+    patient_number = 0
+    day = start_day
+    while day <= end_day:
+        if is_open(day):
+            for doctor_id in doctor_ids:
+                # Busier days and quieter days, never more than the opening slots
+                total = min(len(slots), max(0, round(rng.gauss(per_day, per_day / 3))))
+                for slot in sorted(rng.sample(slots, total)):
+                    patient_number += 1
+                    assigned = rng.random() >= unassigned_ratio
+                    yield {
+                        'schedule_time': datetime.combine(day, slot).isoformat() + 'Z',
+                        'patient_name': f'patient{rng.randint(1, patient_number)}',
+                        'doctor_id': doctor_id if assigned else None,
+                        'comments': 'Seeded findings' if assigned and day < today else None,
+                        'is_accepted': assigned and rng.random() < accepted_ratio,
+                    }
+        day += timedelta(days=1)
+
+
+@click.command('seed-db')
+@click.option('--doctors', type=click.IntRange(min=1), default=20, show_default=True)
+@click.option('--schedulers', type=click.IntRange(min=0), default=5, show_default=True)
+@click.option('--months', type=click.IntRange(min=1), default=6, show_default=True,
+              help='Months of past appointments, one more month is scheduled ahead.')
+@click.option('--per-day', type=click.IntRange(min=0), default=6, show_default=True,
+              help='Average appointments per doctor per opening day.')
+@click.option('--unassigned-ratio', type=click.FloatRange(0, 1), default=0.1, show_default=True)
+@click.option('--accepted-ratio', type=click.FloatRange(0, 1), default=0.6, show_default=True)
+@click.option('--seed', type=int, default=None, help='Random seed, for reproducible datasets.')
+@click.option('--reset', is_flag=True, help='Re-initialize the database before seeding.')
+def seed_db_command(doctors, schedulers, months, per_day, unassigned_ratio, accepted_ratio, seed, reset):
+    """Fill the database with synthetic users and appointments."""
+    if reset:
+        init_db()
+    db = get_db()
+    rng = random.Random(seed)
+
+    users = UserRepository(db)
+    import_records(users, generate_users('doctor_seed', 2, doctors), 1000)
+    import_records(users, generate_users('scheduler_seed', 1, schedulers), 1000)
+    doctor_ids = users.list_ids_by_username_prefix('doctor_seed')
+
+    today = date.today()
+    appointments = generate_appointments(rng, doctor_ids, today - timedelta(days=30 * months),
+                                         today + timedelta(days=30), per_day, unassigned_ratio, accepted_ratio)
+    total = import_records(AppointmentRepository(db), appointments, 10000)
+
+    click.echo(f'Seeded {doctors} doctors, {schedulers} schedulers and {total} appointments.')
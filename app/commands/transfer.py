@@ -0,0 +1,210 @@
+import csv
+import json
+import sqlite3
+import time
+from itertools import islice
+import click
+from app.db import get_db
+from app.repositories import AppointmentRepository, UserRepository
+from app.services.appointment import rebuild_doctor_daily_capacity
+from app.utils.etag import bump_table_version
+
+
+APPOINTMENT_COLUMNS = ('id', 'schedule_time', 'patient_name', 'doctor_id', 'comments', 'is_accepted')
+USER_COLUMNS = ('id', 'username', 'password', 'level_id', 'email', 'fullName', 'status')
+INTEGER_COLUMNS = {'id', 'doctor_id', 'level_id'}
+BOOLEAN_COLUMNS = {'is_accepted', 'status'}
+FILE_FORMATS = ('csv', 'ndjson')
+DEFAULT_CHUNK_SIZE = 10000
+
+format_option = click.option('--format', 'file_format', type=click.Choice(FILE_FORMATS), default=None,
+                             help='File format, guessed from the file extension by default.')
+chunk_size_option = click.option('--chunk-size', type=click.IntRange(min=1), default=DEFAULT_CHUNK_SIZE,
+                                 show_default=True, help='Rows per batch, each batch is its own transaction.')
+
+
+def get_file_format(file, file_format):
+    if file_format is not None:
+        return file_format
+
+    return 'csv' if getattr(file, 'name', '').endswith('.csv') else 'ndjson'
+
+
+def read_records(file, file_format):
+    """
+        Lazily yields every record of a CSV or NDJSON file as dict
+    """
+    if file_format == 'csv':
+        return csv.DictReader(file)
+
+    return (json.loads(line) for line in file if line.strip())
+
+
+def to_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true')
+
+    return bool(value)
+
+
+def to_row(record, columns):
+    """
+        Converts a record into the insert parameters of columns
+        CSV empty strings are stored as NULL
+    """
+    row = []
+    for column in columns:
+        value = record.get(column)
+        if value == '':
+            value = None
+        if column in BOOLEAN_COLUMNS:
+            value = to_bool(value) if value is not None else False
+        elif column in INTEGER_COLUMNS and value is not None:
+            value = int(value)
+        row.append(value)
+
+    return row
+
+
+def import_records(repository, records, chunk_size):
+    """
+        Inserts records with every column of the repository's model, in batches of chunk_size rows,
+        one transaction per batch
+    """
+    columns = repository.model.FIELDS
+    total = 0
+    started = time.perf_counter()
+    while True:
+        try:
+            chunk = [to_row(record, columns) for record in islice(records, chunk_size)]
+        except (ValueError, TypeError) as err:
+            raise click.ClickException(f"Invalid record after row {total}: {err}")
+        if not chunk:
+            break
+
+        try:
+            with repository.db:
+                repository.import_rows(chunk)
+        except sqlite3.Error as err:
+            raise click.ClickException(f"Batch starting at row {total + 1} rejected: {err}")
+
+        total += len(chunk)
+        elapsed = time.perf_counter() - started
+        click.echo(f"{repository.table}: {total} rows imported ({total / elapsed:.0f} rows/s)", err=True)
+
+    return total
+
+
+def drop_table_indexes(db, table):
+    """
+        Drops the indexes and triggers of table, returns the statements to re-create them
+    """
+    query = "SELECT type, name, sql FROM sqlite_master " \
+            "WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL"
+    objects = db.execute(query, (table,)).fetchall()
+    with db:
+        for object_type, name, _ in objects:
+            db.execute(f"DROP {object_type} {name}")
+
+    return [sql for _, _, sql in objects]
+
+
+def restore_table_indexes(db, statements):
+    with db:
+        for sql in statements:
+            db.execute(sql)
+
+
+def export_records(cursor, file, file_format, chunk_size):
+    """
+        Writes the rows of an executed cursor, fetching chunk_size rows at a time
+    """
+    columns = [column[0] for column in cursor.description]
+    if file_format == 'csv':
+        writer = csv.writer(file)
+        writer.writerow(columns)
+
+    total = 0
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        if file_format == 'csv':
+            writer.writerows(rows)
+        else:
+            file.writelines(json.dumps(dict(zip(columns, row))) + '\n' for row in rows)
+        total += len(rows)
+        click.echo(f"{total} rows exported", err=True)
+
+    return total
+
+
+@click.command('import-appointments')
+@click.argument('file', type=click.File('r', encoding='utf8'))
+@format_option
+@chunk_size_option
+@click.option('--rebuild-indexes', is_flag=True,
+              help='Drop the appointments indexes and triggers during the load and re-create them after.')
+def import_appointments_command(file, file_format, chunk_size, rebuild_indexes):
+    """Import appointments from a CSV or NDJSON file."""
+    db = get_db()
+    records = read_records(file, get_file_format(file, file_format))
+    if not rebuild_indexes:
+        total = import_records(AppointmentRepository(db), records, chunk_size)
+    else:
+        statements = drop_table_indexes(db, 'appointments')
+        try:
+            total = import_records(AppointmentRepository(db), records, chunk_size)
+        finally:
+            click.echo('Rebuilding appointments indexes', err=True)
+            restore_table_indexes(db, statements)
+            # Triggers were dropped during the load
+            rebuild_doctor_daily_capacity(db)
+            bump_table_version(db, 'appointments')
+
+    click.echo(f'Imported {total} appointments.')
+
+
+@click.command('export-appointments')
+@click.argument('file', type=click.File('w', encoding='utf8'))
+@format_option
+@chunk_size_option
+@click.option('--date-from', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Only appointments scheduled from this date.')
+@click.option('--date-to', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Only appointments scheduled until this date.')
+@click.option('--doctor-id', type=int, default=None, help='Only appointments of this doctor.')
+def export_appointments_command(file, file_format, chunk_size, date_from, date_to, doctor_id):
+    """Export appointments to a CSV or NDJSON file."""
+    filters = {
+        'date_from': date_from.date() if date_from is not None else None,
+        'date_to': date_to.date() if date_to is not None else None,
+        'doctor_id': doctor_id,
+    }
+    query, params = AppointmentRepository.list_query(filters, fields=APPOINTMENT_COLUMNS)
+    cursor = get_db().execute(query, params)
+    total = export_records(cursor, file, get_file_format(file, file_format), chunk_size)
+    click.echo(f'Exported {total} appointments.', err=True)
+
+
+@click.command('import-users')
+@click.argument('file', type=click.File('r', encoding='utf8'))
+@format_option
+@chunk_size_option
+def import_users_command(file, file_format, chunk_size):
+    """Import users from a CSV or NDJSON file."""
+    db = get_db()
+    records = read_records(file, get_file_format(file, file_format))
+    total = import_records(UserRepository(db), records, chunk_size)
+    click.echo(f'Imported {total} users.')
+
+
+@click.command('export-users')
+@click.argument('file', type=click.File('w', encoding='utf8'))
+@format_option
+@chunk_size_option
+def export_users_command(file, file_format, chunk_size):
+    """Export users to a CSV or NDJSON file."""
+    cursor = get_db().execute(*UserRepository.list_query({}, fields=USER_COLUMNS))
+    total = export_records(cursor, file, get_file_format(file, file_format), chunk_size)
+    click.echo(f'Exported {total} users.', err=True)
@@ -1,24 +1,185 @@
+import logging
+import os
+import queue
+import re
 import sqlite3
+from urllib.request import pathname2url
 import click
 from flask import current_app, g
+from app.middleware.profiling import InstrumentedConnection
+from app.utils.metrics import metrics
+
+
+MIGRATIONS_DIR = 'migrations'
+MIGRATION_FILE_PATTERN = re.compile(r'^(\d+)_\w+\.sql$')
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    """
+        Keeps up to size idle sqlite connections, shared by every thread of the worker
+        and reused across requests, so threads started per request don't open their own.
+        Pragmas are applied once when the connection is opened and every
+        connection is checked before being handed out.
+        Connections released while the pool is full are closed.
+        read_only: opens the database through a mode=ro URI, so sqlite refuses writes
+        cached_statements: prepared statements kept by each connection, reused by identical SQL text
+    """
+
+    def __init__(self, database, pragmas, persistent=True, metrics=None, read_only=False, cached_statements=128,
+                 size=8):
+        self.database = database
+        self.pragmas = pragmas
+        self.persistent = persistent
+        self.metrics = metrics
+        self.read_only = read_only
+        self.cached_statements = cached_statements
+        # Last released first, it's the one most likely to have a warm page cache
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def connect(self):
+        if self.read_only:
+            database = f'file:{pathname2url(os.path.abspath(self.database))}?mode=ro'
+        else:
+            database = self.database
+        conn = sqlite3.connect(
+            database,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            factory=InstrumentedConnection,
+            uri=self.read_only,
+            cached_statements=self.cached_statements,
+            # Handed to one request at a time, whichever thread serves it
+            check_same_thread=False
+        )
+        conn.row_factory = sqlite3.Row
+        conn.metrics = self.metrics
+        if self.metrics is not None:
+            self.metrics.inc('db_connections_opened_total')
+        for pragma, value in self.pragmas:
+            if value is not None:
+                conn.execute(f'PRAGMA {pragma} = {value}')
+
+        return conn
+
+    def acquire(self):
+        if not self.persistent:
+            return self.connect()
+
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return self.connect()
+            if self.is_healthy(conn):
+                return conn
+            self.close(conn)
+
+    def release(self, conn):
+        if not self.persistent:
+            self.close(conn)
+            return
+
+        conn.query_log = None
+        # Never hand over an unfinished transaction to the next request
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            self.close(conn)
+            return
+
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            self.close(conn)
+
+    def close_all(self):
+        """
+            Closes the idle connections, the ones in use are closed when released to a full pool
+        """
+        while True:
+            try:
+                self.close(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+    def close(self, conn):
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        if self.metrics is not None:
+            self.metrics.inc('db_connections_closed_total')
+
+    @staticmethod
+    def is_healthy(conn):
+        try:
+            conn.execute('SELECT 1').fetchone()
+        except sqlite3.Error:
+            return False
+
+        return True
+
+
+def create_pool(app, read_only=False):
+    config = app.config
+    if read_only:
+        # journal_mode and synchronous are set by the read-write connections
+        pragmas = (
+            ('busy_timeout', config['SQLITE_BUSY_TIMEOUT']),
+            ('cache_size', config['SQLITE_CACHE_SIZE']),
+            ('mmap_size', config['SQLITE_MMAP_SIZE']),
+            ('query_only', 'ON'),
+        )
+    else:
+        pragmas = (
+            ('busy_timeout', config['SQLITE_BUSY_TIMEOUT']),
+            ('journal_mode', config['SQLITE_JOURNAL_MODE']),
+            ('synchronous', config['SQLITE_SYNCHRONOUS']),
+            ('cache_size', config['SQLITE_CACHE_SIZE']),
+            ('mmap_size', config['SQLITE_MMAP_SIZE']),
+        )
+
+    return ConnectionPool(config['DATABASE'], pragmas, config['SQLITE_PERSISTENT_CONNECTIONS'],
+                          metrics if config['METRICS_ENABLED'] else None, read_only,
+                          config['SQLITE_CACHED_STATEMENTS'], config['SQLITE_POOL_SIZE'])
 
 
 def get_db():
     if 'db' not in g:
-        g.db = sqlite3.connect(
-            current_app.config['DATABASE'],
-            detect_types=sqlite3.PARSE_DECLTYPES
-        )
-        g.db.row_factory = sqlite3.Row
+        g.db = current_app.extensions['sqlite_pool'].acquire()
+        # Set for the requests sampled by the profiling middleware
+        g.db.query_log = g.get('query_log')
 
     return g.db
 
 
+def get_read_db():
+    """
+        Returns a read-only connection, from its own pool, for reads outside of a transaction.
+        Under WAL its reads don't wait for the writers
+    """
+    pool = current_app.extensions.get('sqlite_read_pool')
+    if pool is None:
+        return get_db()
+    if 'read_db' not in g:
+        g.read_db = pool.acquire()
+        g.read_db.query_log = g.get('query_log')
+
+    return g.read_db
+
+
 def close_db(e=None):
     db = g.pop('db', None)
 
     if db is not None:
-        db.close()
+        current_app.extensions['sqlite_pool'].release(db)
+
+    read_db = g.pop('read_db', None)
+
+    if read_db is not None:
+        current_app.extensions['sqlite_read_pool'].release(read_db)
 
 
 def init_db():
@@ -27,6 +188,101 @@ def init_db():
     with current_app.open_resource('db_schema.sql') as f:
         db.executescript(f.read().decode('utf8'))
 
+    # The schema script drops every table, so start migrating from scratch
+    db.execute('PRAGMA user_version = 0')
+    migrate_db()
+
+
+def get_schema_version(db):
+    return db.execute('PRAGMA user_version').fetchone()[0]
+
+
+def get_migrations():
+    """
+        Returns the list of (version, filename) of every migration script,
+        ordered by version
+    """
+    migrations_path = os.path.join(current_app.root_path, MIGRATIONS_DIR)
+    migrations = []
+    for filename in os.listdir(migrations_path):
+        match = MIGRATION_FILE_PATTERN.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), filename))
+
+    return sorted(migrations)
+
+
+def split_statements(script):
+    """
+        Splits a sql script into its statements, trigger bodies included
+    """
+    statements = []
+    pending = ''
+    for line in script.splitlines(keepends=True):
+        pending += line
+        if sqlite3.complete_statement(pending):
+            statements.append(pending.strip())
+            pending = ''
+
+    return statements
+
+
+def migrate_db():
+    """
+        Applies every migration newer than the database's user_version.
+        Each migration runs in its own BEGIN IMMEDIATE transaction together with the
+        version bump, so a failed migration leaves the database untouched, and
+        workers starting together apply it once.
+    """
+    db = get_db()
+    current_version = get_schema_version(db)
+    applied = []
+
+    for version, filename in get_migrations():
+        if version <= current_version:
+            continue
+
+        with current_app.open_resource(os.path.join(MIGRATIONS_DIR, filename)) as f:
+            script = f.read().decode('utf8')
+
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            # Another worker may have applied it while this one waited for the write lock
+            if get_schema_version(db) < version:
+                for statement in split_statements(script):
+                    db.execute(statement)
+                db.execute(f'PRAGMA user_version = {version}')
+                applied.append(filename)
+            db.commit()
+        except sqlite3.Error:
+            db.rollback()
+            raise
+
+    return applied
+
+
+def upgrade_schema(app):
+    """
+        Brings an existing database to the latest schema version at startup,
+        as the routes rely on the tables of every migration.
+        Databases without tables are left to init-db
+    """
+    with app.app_context():
+        db = get_db()
+        if db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'appointments'").fetchone() is None:
+            return
+        for filename in migrate_db():
+            logger.warning('Applied migration %s', filename)
+
+
+@click.command('rebuild-capacity')
+def rebuild_capacity_command():
+    """Recompute the per doctor daily appointment counters."""
+    from app.services.appointment import rebuild_doctor_daily_capacity
+
+    total = rebuild_doctor_daily_capacity(get_db())
+    click.echo(f'Rebuilt {total} doctor daily capacity rows.')
+
 
 @click.command('init-db')
 def init_db_command():
@@ -35,6 +291,21 @@ def init_db_command():
     click.echo('Initialized the database.')
 
 
+@click.command('migrate-db')
+def migrate_db_command():
+    """Upgrade the existing database in place without dropping data."""
+    applied = migrate_db()
+    for filename in applied:
+        click.echo(f'Applied migration {filename}')
+    click.echo(f'Database is at schema version {get_schema_version(get_db())}.')
+
+
 def init_app(app):
+    app.extensions['sqlite_pool'] = create_pool(app)
+    if app.config['SQLITE_READ_ONLY_CONNECTIONS']:
+        app.extensions['sqlite_read_pool'] = create_pool(app, read_only=True)
     app.teardown_appcontext(close_db)
-    app.cli.add_command(init_db_command)
\ No newline at end of file
+    upgrade_schema(app)
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(migrate_db_command)
+    app.cli.add_command(rebuild_capacity_command)
@@ -2,6 +2,8 @@ DROP TABLE IF EXISTS user;
 DROP TABLE IF EXISTS post;
 DROP TABLE IF EXISTS user_level;
 DROP TABLE IF EXISTS appointments;
+DROP TABLE IF EXISTS doctor_daily_capacity;
+DROP TABLE IF EXISTS table_versions;
 
 CREATE TABLE user_level (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
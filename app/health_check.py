@@ -1,4 +1,5 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, Response, jsonify, current_app
+from app.utils.metrics import metrics
 
 
 bp_routers = Blueprint('health_check', __name__)
@@ -8,9 +9,25 @@ bp_routers = Blueprint('health_check', __name__)
 def health_check():
     return jsonify({
         'status': 'OK',
+        'token_cache': current_app.extensions['token_cache'].stats(),
     }), 200
 
 
+@bp_routers.route("/metrics", methods=['GET'])
+def get_metrics():
+    """
+        Prometheus metrics of this process
+    """
+    token_cache = current_app.extensions['token_cache'].stats()
+    token_cache_metrics = (
+        ('jwt_cache_hits_total', 'counter', 'Verified tokens served from the cache', [({}, token_cache['hits'])]),
+        ('jwt_cache_misses_total', 'counter', 'Tokens verified with jwt.decode', [({}, token_cache['misses'])]),
+        ('jwt_cache_size', 'gauge', 'Verified tokens currently cached', [({}, token_cache['size'])]),
+    )
+
+    return Response(metrics.render(token_cache_metrics), mimetype='text/plain; version=0.0.4')
+
+
 def component_blueprint():
     """
     This returns the component blueprint
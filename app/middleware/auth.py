@@ -1,7 +1,76 @@
+from collections import OrderedDict
 from functools import wraps
-from flask import request, jsonify, g
+from flask import request, jsonify, g, current_app
+import hashlib
+import threading
+import time
 import jwt
-import os
+
+
+class TokenCache:
+    """
+        Bounded LRU cache of verified token payloads keyed by token digest.
+        Entries expire at the token's exp claim
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(token):
+        return hashlib.sha256(token.encode('utf8')).digest()
+
+    def get(self, token):
+        key = self.digest(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, payload = entry
+                if expires_at > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return payload
+                del self._entries[key]
+            self.misses += 1
+
+        return None
+
+    def put(self, token, payload):
+        # Tokens without expiry are always verified
+        if self.max_size <= 0 or 'exp' not in payload:
+            return
+        key = self.digest(token)
+        with self._lock:
+            self._entries[key] = (payload['exp'], payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+            }
+
+
+def decode_token(token):
+    """
+        Returns the token payload, verifying the signature only on cache misses
+    """
+    cache = current_app.extensions['token_cache']
+    data = cache.get(token)
+    if data is None:
+        data = jwt.decode(token, current_app.config['JWT_SECRET'], algorithms='HS256')
+        cache.put(token, data)
+
+    return dict(data)
 
 
 def token_required(f):
@@ -16,9 +85,7 @@ def token_required(f):
 
         try:
             # decoding the payload to fetch the stored details
-            secrets = os.environ.get('JWT_SECRET')
-            data = jwt.decode(token, secrets, algorithms='HS256')
-            g.auth_data = data
+            g.auth_data = decode_token(token)
         except Exception as err:
             print(err)
             return jsonify({
@@ -28,3 +95,7 @@ def token_required(f):
         return f(*args, **kwargs)
 
     return decorated
+
+
+def init_app(app):
+    app.extensions['token_cache'] = TokenCache(app.config['JWT_CACHE_SIZE'])
@@ -0,0 +1,144 @@
+import zlib
+from flask import current_app, request
+from werkzeug.wsgi import ClosingIterator
+from app.utils.metrics import metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson', 'text/csv', 'text/html', 'text/plain')
+# Streamed bodies are flushed to the client every time this much input was compressed
+STREAM_FLUSH_SIZE = 16 * 1024
+# gzip container, as opposed to a raw deflate or zlib stream
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+metrics.describe('http_responses_compressed_total', 'counter', 'Compressed responses by endpoint and encoding')
+metrics.describe('http_response_bytes_saved_total', 'counter', 'Bytes saved by compressing buffered responses')
+
+
+class GzipCompressor:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        # Ends the current block so everything compressed so far can be decoded
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class BrotliCompressor:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+COMPRESSORS = {'gzip': GzipCompressor, 'br': BrotliCompressor}
+
+
+def get_encodings():
+    # Preferred first when the client weighs them equally
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def get_level(encoding):
+    """
+        Compression level of the current endpoint, gzip 1-9, brotli quality 0-11
+    """
+    config = current_app.config
+    levels = config['COMPRESSION_ENDPOINT_LEVELS'].get(request.endpoint, {})
+
+    return levels.get(encoding, config['COMPRESSION_LEVELS'][encoding])
+
+
+def add_vary(response):
+    response.vary.add('Accept-Encoding')
+
+
+def should_compress(response):
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    if response.direct_passthrough or 'Content-Encoding' in response.headers:
+        return False
+
+    return response.mimetype in COMPRESSIBLE_MIMETYPES
+
+
+def compress_stream(chunks, compressor):
+    """
+        Compresses a streamed body chunk by chunk, flushing every STREAM_FLUSH_SIZE bytes
+        so the client keeps receiving rows while the stream is produced
+    """
+    pending = 0
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        pending += len(chunk)
+        if pending >= STREAM_FLUSH_SIZE:
+            data += compressor.flush()
+            pending = 0
+        if data:
+            yield data
+
+    yield compressor.finish()
+
+
+def compress_response(response):
+    """
+        Compresses the body with the best encoding the client accepts.
+        Buffered bodies below COMPRESSION_MIN_SIZE are sent as is,
+        streamed bodies are always compressed as their size is unknown
+    """
+    if not should_compress(response):
+        return response
+
+    # Caches must keep one copy per encoding, even of the uncompressed ones
+    add_vary(response)
+    encoding = request.accept_encodings.best_match(get_encodings())
+    if encoding is None:
+        return response
+
+    config = current_app.config
+    if not response.is_streamed and response.calculate_content_length() < config['COMPRESSION_MIN_SIZE']:
+        return response
+
+    compressor = COMPRESSORS[encoding](get_level(encoding))
+    if response.is_streamed:
+        body = response.response
+        # Closing the compressed stream still closes the original one
+        response.response = ClosingIterator(compress_stream(response.iter_encoded(), compressor),
+                                            getattr(body, 'close', None))
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        compressed = compressor.compress(data) + compressor.finish()
+        response.set_data(compressed)
+        metrics.inc('http_response_bytes_saved_total', len(data) - len(compressed), encoding=encoding)
+
+    response.headers['Content-Encoding'] = encoding
+    # A strong ETag names the exact bytes, the compressed body only matches weakly
+    etag, weak = response.get_etag()
+    if etag is not None and not weak:
+        response.set_etag(etag, weak=True)
+    metrics.inc('http_responses_compressed_total', endpoint=request.endpoint or 'unknown', encoding=encoding)
+
+    return response
+
+
+def init_app(app):
+    if app.config['COMPRESSION_ENABLED']:
+        app.after_request(compress_response)
@@ -0,0 +1,29 @@
+import time
+from flask import g, request
+from app.utils.metrics import metrics
+
+
+def start_timer():
+    g.request_started = time.perf_counter()
+
+
+def record_request(response):
+    started = g.get('request_started')
+    if started is None:
+        return response
+
+    labels = {
+        'endpoint': request.endpoint or 'unknown',
+        'method': request.method,
+        'status': response.status_code,
+    }
+    metrics.inc('http_requests_total', **labels)
+    metrics.observe('http_request_duration_seconds', time.perf_counter() - started, **labels)
+
+    return response
+
+
+def init_app(app):
+    if app.config['METRICS_ENABLED']:
+        app.before_request(start_timer)
+        app.after_request(record_request)
@@ -0,0 +1,151 @@
+import logging
+import random
+import sqlite3
+import time
+from collections import defaultdict
+from flask import current_app, g, request
+
+
+logger = logging.getLogger(__name__)
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+        Records the text, duration and row count of every statement
+        while its connection has a query_log
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._record = None
+
+    def _run(self, method, sql, parameters):
+        connection = self.connection
+        log = connection.query_log
+        if log is None and connection.metrics is None:
+            self._record = None
+            return method(sql, parameters)
+
+        # [statement, seconds, rows]
+        self._record = [sql, 0.0, 0] if log is not None else None
+        started = time.perf_counter()
+        try:
+            return method(sql, parameters)
+        finally:
+            seconds = time.perf_counter() - started
+            if connection.metrics is not None:
+                connection.metrics.inc('db_queries_total')
+                connection.metrics.inc('db_query_duration_seconds_total', seconds)
+            if log is not None:
+                self._record[1] = seconds
+                if self.rowcount > 0:
+                    self._record[2] = self.rowcount
+                log.append(self._record)
+
+    def _fetch(self, method, *args):
+        record = self._record
+        if record is None:
+            return method(*args)
+
+        started = time.perf_counter()
+        rows = method(*args)
+        record[1] += time.perf_counter() - started
+        if isinstance(rows, list):
+            record[2] += len(rows)
+        elif rows is not None:
+            record[2] += 1
+
+        return rows
+
+    def execute(self, sql, parameters=()):
+        return self._run(super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._run(super().executemany, sql, seq_of_parameters)
+
+    def fetchone(self):
+        return self._fetch(super().fetchone)
+
+    def fetchmany(self, *args):
+        return self._fetch(super().fetchmany, *args)
+
+    def fetchall(self):
+        return self._fetch(super().fetchall)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+        sqlite connection whose cursors are InstrumentedCursor,
+        statements are recorded into query_log when it is set
+        and counted into metrics when it is set
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.query_log = None
+        self.metrics = None
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    # sqlite3.Connection's shortcuts open a plain cursor in C, bypassing cursor()
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+def get_query_breakdown(query_log):
+    """
+        Groups the recorded statements by text: {statement: [count, seconds, rows]}
+        sorted by total time
+    """
+    breakdown = defaultdict(lambda: [0, 0.0, 0])
+    for statement, seconds, rows in query_log:
+        entry = breakdown[' '.join(statement.split())]
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] += rows
+
+    return dict(sorted(breakdown.items(), key=lambda item: item[1][1], reverse=True))
+
+
+def start_profiling():
+    config = current_app.config
+    if config['PROFILE_ENABLED'] and random.random() < config['PROFILE_SAMPLE_RATE']:
+        g.query_log = []
+        g.profile_started = time.perf_counter()
+
+
+def log_slow_request(response):
+    query_log = g.get('query_log')
+    if query_log is None:
+        return response
+
+    config = current_app.config
+    elapsed_ms = (time.perf_counter() - g.profile_started) * 1000
+    breakdown = get_query_breakdown(query_log)
+    repeated = {statement: entry[0] for statement, entry in breakdown.items()
+                if entry[0] >= config['PROFILE_N_PLUS_ONE_THRESHOLD']}
+
+    if elapsed_ms >= config['PROFILE_SLOW_REQUEST_MS']:
+        db_ms = sum(entry[1] for entry in breakdown.values()) * 1000
+        lines = [f"{entry[0]}x {entry[1] * 1000:.2f}ms {entry[2]} rows: {statement}"
+                 for statement, entry in breakdown.items()]
+        logger.warning('Slow request %s %s %s: %.2fms, %d queries in %.2fms\n%s',
+                       request.method, request.path, response.status_code, elapsed_ms,
+                       len(query_log), db_ms, '\n'.join(lines))
+    for statement, count in repeated.items():
+        logger.warning('Possible N+1 on %s %s: %d executions of %s',
+                       request.method, request.path, count, statement)
+
+    return response
+
+
+def init_app(app):
+    app.before_request(start_profiling)
+    app.after_request(log_slow_request)
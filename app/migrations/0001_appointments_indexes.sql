@@ -0,0 +1,16 @@
+-- Conflict checks: validate_doctor_appointments_schedule
+CREATE INDEX IF NOT EXISTS idx_appointments_doctor_schedule
+  ON appointments (doctor_id, schedule_time);
+
+-- Conflict checks: validate_patient_appointments_schedule
+CREATE INDEX IF NOT EXISTS idx_appointments_patient_schedule
+  ON appointments (patient_name, schedule_time);
+
+-- Daily counters: date(schedule_time) = CURRENT_DATE
+CREATE INDEX IF NOT EXISTS idx_appointments_schedule_day
+  ON appointments (date(schedule_time));
+
+-- Daily accepted counters: is_accepted = 1
+CREATE INDEX IF NOT EXISTS idx_appointments_accepted_day
+  ON appointments (date(schedule_time), doctor_id)
+  WHERE is_accepted = 1;
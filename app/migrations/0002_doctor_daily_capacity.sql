@@ -0,0 +1,47 @@
+-- Per (doctor, day) appointment counters, kept in sync by triggers.
+-- Unassigned appointments are counted under doctor_id 0.
+CREATE TABLE doctor_daily_capacity (
+  doctor_id INTEGER NOT NULL,
+  day TEXT NOT NULL,
+  total INTEGER NOT NULL DEFAULT 0,
+  accepted INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (doctor_id, day)
+) WITHOUT ROWID;
+
+CREATE INDEX idx_doctor_daily_capacity_day
+  ON doctor_daily_capacity (day);
+
+INSERT INTO doctor_daily_capacity (doctor_id, day, total, accepted)
+SELECT IFNULL(doctor_id, 0), date(schedule_time), COUNT(*), SUM(is_accepted = 1)
+FROM appointments
+GROUP BY IFNULL(doctor_id, 0), date(schedule_time);
+
+CREATE TRIGGER trg_appointments_capacity_insert
+AFTER INSERT ON appointments
+BEGIN
+  INSERT INTO doctor_daily_capacity (doctor_id, day, total, accepted)
+  VALUES (IFNULL(NEW.doctor_id, 0), date(NEW.schedule_time), 1, NEW.is_accepted = 1)
+  ON CONFLICT (doctor_id, day) DO UPDATE
+  SET total = total + 1, accepted = accepted + excluded.accepted;
+END;
+
+CREATE TRIGGER trg_appointments_capacity_delete
+AFTER DELETE ON appointments
+BEGIN
+  UPDATE doctor_daily_capacity
+  SET total = total - 1, accepted = accepted - (OLD.is_accepted = 1)
+  WHERE doctor_id = IFNULL(OLD.doctor_id, 0) AND day = date(OLD.schedule_time);
+END;
+
+CREATE TRIGGER trg_appointments_capacity_update
+AFTER UPDATE OF schedule_time, doctor_id, is_accepted ON appointments
+BEGIN
+  UPDATE doctor_daily_capacity
+  SET total = total - 1, accepted = accepted - (OLD.is_accepted = 1)
+  WHERE doctor_id = IFNULL(OLD.doctor_id, 0) AND day = date(OLD.schedule_time);
+
+  INSERT INTO doctor_daily_capacity (doctor_id, day, total, accepted)
+  VALUES (IFNULL(NEW.doctor_id, 0), date(NEW.schedule_time), 1, NEW.is_accepted = 1)
+  ON CONFLICT (doctor_id, day) DO UPDATE
+  SET total = total + 1, accepted = accepted + excluded.accepted;
+END;
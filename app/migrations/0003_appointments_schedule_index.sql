@@ -0,0 +1,3 @@
+-- Keyset pagination: ORDER BY schedule_time, id
+CREATE INDEX IF NOT EXISTS idx_appointments_schedule
+  ON appointments (schedule_time);
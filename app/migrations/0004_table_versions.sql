@@ -0,0 +1,45 @@
+-- Per table change counters, bumped by triggers on every write, used as ETags.
+-- Counters start at a random value so a re-created database doesn't reuse old ETags.
+CREATE TABLE table_versions (
+  name TEXT PRIMARY KEY,
+  version INTEGER NOT NULL
+) WITHOUT ROWID;
+
+INSERT INTO table_versions (name, version)
+VALUES ('appointments', abs(random() % 1000000000)), ('user', abs(random() % 1000000000));
+
+CREATE TRIGGER trg_appointments_version_insert
+AFTER INSERT ON appointments
+BEGIN
+  UPDATE table_versions SET version = version + 1 WHERE name = 'appointments';
+END;
+
+CREATE TRIGGER trg_appointments_version_update
+AFTER UPDATE ON appointments
+BEGIN
+  UPDATE table_versions SET version = version + 1 WHERE name = 'appointments';
+END;
+
+CREATE TRIGGER trg_appointments_version_delete
+AFTER DELETE ON appointments
+BEGIN
+  UPDATE table_versions SET version = version + 1 WHERE name = 'appointments';
+END;
+
+CREATE TRIGGER trg_user_version_insert
+AFTER INSERT ON user
+BEGIN
+  UPDATE table_versions SET version = version + 1 WHERE name = 'user';
+END;
+
+CREATE TRIGGER trg_user_version_update
+AFTER UPDATE ON user
+BEGIN
+  UPDATE table_versions SET version = version + 1 WHERE name = 'user';
+END;
+
+CREATE TRIGGER trg_user_version_delete
+AFTER DELETE ON user
+BEGIN
+  UPDATE table_versions SET version = version + 1 WHERE name = 'user';
+END;
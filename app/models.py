@@ -0,0 +1,95 @@
+from functools import lru_cache
+
+
+class Columns:
+    """
+        Names of the columns selected by a query, shared by every row it returns
+    """
+    __slots__ = ('names', 'index')
+
+    def __init__(self, names):
+        self.names = names
+        self.index = {name: position for position, name in enumerate(names)}
+
+
+@lru_cache(maxsize=256)
+def get_columns(description):
+    """
+        Columns of a cursor.description, shared by the statements selecting the same columns
+    """
+    return Columns(tuple(column[0] for column in description))
+
+
+def column_property(name):
+    def get(self):
+        try:
+            return self._values[self._columns.index[name]]
+        except KeyError:
+            raise AttributeError(f"{type(self).__name__}.{name} was not selected") from None
+
+    return property(get)
+
+
+class Record:
+    """
+        Row of a table backed by the tuple sqlite returns.
+        Built by row_factory straight from the cursor, only the selected columns are set.
+        Columns are read as attributes, or by name like sqlite3.Row and dict
+    """
+    __slots__ = ('_columns', '_values')
+    FIELDS = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name in cls.FIELDS:
+            setattr(cls, name, column_property(name))
+
+    def __init__(self, columns, values):
+        self._columns = columns
+        self._values = values
+
+    @classmethod
+    def row_factory(cls, cursor, row):
+        """
+            sqlite3 row_factory, the column names are read once per executed statement
+        """
+        description = cursor.description
+        cached = getattr(cursor, 'record_columns', None)
+        if cached is None or cached[0] is not description:
+            columns = get_columns(description)
+            try:
+                cursor.record_columns = (description, columns)
+            except AttributeError:
+                # Plain sqlite3.Cursor has no __dict__, the names are looked up by description for every row
+                return cls(columns, row)
+        else:
+            columns = cached[1]
+
+        return cls(columns, row)
+
+    def keys(self):
+        return self._columns.names
+
+    def __getitem__(self, key):
+        return self._values[self._columns.index[key]]
+
+    def __contains__(self, key):
+        return key in self._columns.index
+
+    def to_json(self):
+        return dict(zip(self._columns.names, self._values))
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={value!r}' for name, value in zip(self._columns.names, self._values))
+
+        return f'{type(self).__name__}({fields})'
+
+
+class Appointment(Record):
+    __slots__ = ()
+    FIELDS = ('id', 'schedule_time', 'patient_name', 'doctor_id', 'comments', 'is_accepted')
+
+
+class User(Record):
+    __slots__ = ()
+    FIELDS = ('id', 'username', 'password', 'level_id', 'email', 'fullName', 'status')
@@ -0,0 +1,518 @@
+import json
+from datetime import timedelta
+from functools import lru_cache
+from app.models import Appointment, User
+from app.utils.pagination import decode_cursor
+
+
+APPOINTMENTS_SORT_KEYS = ('schedule_time', 'id')
+USERS_SORT_KEYS = ('id',)
+
+# Every statement is fixed text with bound parameters, so sqlite prepares it once
+# per connection and reuses it from the connection's statement cache.
+# {columns} is only ever filled with whitelisted column names by select_columns.
+
+APPOINTMENT_GET_QUERY = 'SELECT {columns} FROM appointments WHERE id = ?'
+
+# One statement whatever the number of ids, they're bound as a single JSON array
+APPOINTMENT_GET_MANY_QUERY = 'SELECT {columns} FROM appointments ' \
+                             'WHERE id IN (SELECT value FROM json_each(?)) ' \
+                             'ORDER BY id'
+
+APPOINTMENT_LIST_QUERY = 'SELECT {columns} FROM appointments {where}ORDER BY schedule_time, id'
+
+
+
+def bind_value(value):
+    return (value,)
+
+
+# schedule_time is stored in ISO format, so a day is bound as a text range the schedule indexes can search
+def bind_day_start(day):
+    return (day.isoformat(),)
+
+
+def bind_day_end(day):
+    return ((day + timedelta(days=1)).isoformat(),)
+
+
+def bind_day(day):
+    return bind_day_start(day) + bind_day_end(day)
+
+
+# Listing filters, in the order their conditions are added, with the parameters bound for their value
+APPOINTMENT_FILTERS = (
+    ('date', 'schedule_time >= ? AND schedule_time < ?', bind_day),
+    ('date_from', 'schedule_time >= ?', bind_day_start),
+    ('date_to', 'schedule_time < ?', bind_day_end),
+    ('doctor_id', 'doctor_id = ?', bind_value),
+    ('is_accepted', 'is_accepted = ?', bind_value),
+    ('patient_name', 'patient_name = ?', bind_value),
+)
+
+APPOINTMENT_AFTER_CONDITION = '(schedule_time, id) > (?, ?)'
+
+APPOINTMENT_PATIENT_SCHEDULE_QUERY = 'SELECT id FROM appointments WHERE patient_name = ? AND schedule_time = ?'
+
+APPOINTMENT_DOCTOR_QUERY = 'SELECT id FROM appointments WHERE id = ? AND doctor_id = ?'
+
+APPOINTMENT_INSERT_QUERY = 'INSERT INTO appointments (patient_name, schedule_time, doctor_id) VALUES (?, ?, ?)'
+
+# Every column, in the order of Appointment.FIELDS
+APPOINTMENT_IMPORT_QUERY = 'INSERT INTO appointments (id, schedule_time, patient_name, doctor_id, comments, is_accepted) ' \
+                           'VALUES (?, ?, ?, ?, ?, ?)'
+
+LAST_INSERT_ID_QUERY = 'SELECT last_insert_rowid()'
+
+APPOINTMENT_UPDATE_QUERY = 'UPDATE appointments ' \
+                           'SET schedule_time = ?, patient_name = ?, doctor_id = ?, is_accepted = ? ' \
+                           'WHERE id = ?'
+
+APPOINTMENT_SET_COMMENTS_QUERY = 'UPDATE appointments SET comments = ? WHERE id = ?'
+
+APPOINTMENT_ASSIGN_QUERY = 'UPDATE appointments SET doctor_id = ? WHERE id = ?'
+
+# Leaves the appointments assigned since they were planned untouched
+APPOINTMENT_ASSIGN_UNASSIGNED_QUERY = 'UPDATE appointments SET doctor_id = ? WHERE id = ? AND doctor_id IS NULL'
+
+APPOINTMENT_ACCEPT_QUERY = 'UPDATE appointments SET doctor_id = ?, is_accepted = 1 WHERE id = ?'
+
+# schedule_time is stored in ISO format, so the days are bound as a text range of idx_appointments_doctor_schedule
+DOCTOR_SCHEDULE_QUERY = """
+    SELECT id, schedule_time FROM appointments
+    WHERE doctor_id = ? AND schedule_time >= ? AND schedule_time < ?
+    ORDER BY schedule_time
+"""
+
+UNASSIGNED_APPOINTMENTS_QUERY = """
+    SELECT id, schedule_time FROM appointments
+    WHERE doctor_id IS NULL AND is_accepted = 0
+      AND schedule_time >= ? AND schedule_time < ?
+    ORDER BY schedule_time, id
+"""
+
+ASSIGNED_APPOINTMENTS_QUERY = """
+    SELECT id, doctor_id, schedule_time FROM appointments
+    WHERE doctor_id IS NOT NULL
+      AND schedule_time >= ? AND schedule_time < ?
+"""
+
+# Checks of the booking engine, each read in one statement inside the booking transaction
+BOOKING_CHECKS_QUERY = """
+    SELECT
+      (SELECT COUNT(*) FROM appointments
+        WHERE patient_name = :patient_name AND schedule_time = :schedule_time) AS patient_appointments,
+      (SELECT IFNULL(status, 0) FROM user WHERE id = :doctor_id) AS doctor_status,
+      (SELECT IFNULL(SUM(total), 0) FROM doctor_daily_capacity
+        WHERE day = CURRENT_DATE) AS curr_total_appointments
+"""
+
+ASSIGN_CHECKS_QUERY = """
+    SELECT
+      (SELECT schedule_time FROM appointments WHERE id = :appointment_id) AS schedule_time,
+      (SELECT IFNULL(status, 0) FROM user WHERE id = :doctor_id) AS doctor_status,
+      (SELECT IFNULL(SUM(total), 0) FROM doctor_daily_capacity
+        WHERE day = CURRENT_DATE) AS curr_total_appointments
+"""
+
+ACCEPT_CHECKS_QUERY = """
+    SELECT
+      (SELECT IFNULL(status, 0) FROM user WHERE id = :doctor_id) AS doctor_status,
+      (SELECT COUNT(*) FROM appointments
+        WHERE id = :appointment_id AND doctor_id = :doctor_id) AS doctor_appointment,
+      (SELECT IFNULL(SUM(accepted), 0) FROM doctor_daily_capacity
+        WHERE day = CURRENT_DATE) AS curr_total_accepted_appointments,
+      (SELECT IFNULL(SUM(accepted), 0) FROM doctor_daily_capacity
+        WHERE doctor_id = :doctor_id AND day = CURRENT_DATE) AS doctor_curr_accepted_appointments
+"""
+
+RESCHEDULE_CHECKS_QUERY = """
+    SELECT
+      (SELECT COUNT(*) FROM appointments
+        WHERE patient_name = :patient_name AND schedule_time = :schedule_time
+          AND id != :appointment_id) AS patient_appointments,
+      (SELECT IFNULL(status, 0) FROM user WHERE id = :doctor_id) AS doctor_status,
+      (SELECT IFNULL(SUM(total), 0) FROM doctor_daily_capacity
+        WHERE day = CURRENT_DATE) AS curr_total_appointments,
+      (SELECT IFNULL(SUM(accepted), 0) FROM doctor_daily_capacity
+        WHERE day = CURRENT_DATE) AS curr_total_accepted_appointments,
+      (SELECT IFNULL(SUM(accepted), 0) FROM doctor_daily_capacity
+        WHERE doctor_id = :doctor_id AND day = CURRENT_DATE) AS doctor_curr_accepted_appointments
+"""
+
+# Read from the archive database attached to the connection as archive
+ARCHIVED_APPOINTMENT_QUERY = 'SELECT {columns} FROM archive.appointments WHERE id = ?'
+
+# Oldest live appointments first, through the schedule_time index
+ARCHIVE_BATCH_IDS = """
+    SELECT id FROM main.appointments
+    WHERE schedule_time < :cutoff
+    ORDER BY schedule_time
+    LIMIT :batch_size
+"""
+
+ARCHIVE_COPY_QUERY = f"""
+    INSERT OR REPLACE INTO archive.appointments (id, schedule_time, patient_name, doctor_id, comments, is_accepted)
+    SELECT id, schedule_time, patient_name, doctor_id, comments, is_accepted
+    FROM main.appointments
+    WHERE id IN ({ARCHIVE_BATCH_IDS})
+"""
+
+ARCHIVE_DELETE_QUERY = f"""
+    DELETE FROM main.appointments
+    WHERE id IN ({ARCHIVE_BATCH_IDS})
+"""
+
+# doctor_daily_capacity holds one row per doctor and day, unassigned appointments under doctor 0
+DAY_COUNT_QUERY = 'SELECT total FROM doctor_daily_capacity WHERE doctor_id = ? AND day = date(?)'
+
+DAY_ACCEPTED_QUERY = 'SELECT accepted FROM doctor_daily_capacity WHERE doctor_id = ? AND day = date(?)'
+
+TODAY_TOTALS_QUERY = 'SELECT IFNULL(SUM(total), 0), IFNULL(SUM(accepted), 0) FROM doctor_daily_capacity ' \
+                     'WHERE day = CURRENT_DATE'
+
+DOCTOR_DAILY_TOTALS_QUERY = """
+    SELECT doctor_id, day, total FROM doctor_daily_capacity
+    WHERE doctor_id != 0 AND day >= ? AND day <= ?
+"""
+
+DAILY_CAPACITY_CLEAR_QUERY = 'DELETE FROM doctor_daily_capacity'
+
+DAILY_CAPACITY_REBUILD_QUERY = 'INSERT INTO doctor_daily_capacity (doctor_id, day, total, accepted) ' \
+                               'SELECT IFNULL(doctor_id, 0), date(schedule_time), COUNT(*), SUM(is_accepted = 1) ' \
+                               'FROM appointments ' \
+                               'GROUP BY IFNULL(doctor_id, 0), date(schedule_time)'
+
+USER_GET_QUERY = 'SELECT {columns} FROM user WHERE id = ?'
+
+USER_GET_MANY_QUERY = 'SELECT {columns} FROM user ' \
+                      'WHERE id IN (SELECT value FROM json_each(?)) ' \
+                      'ORDER BY id'
+
+USER_BY_USERNAME_QUERY = 'SELECT {columns} FROM user WHERE username = ?'
+
+USER_LIST_QUERY = 'SELECT {columns} FROM user {where}ORDER BY id'
+
+USER_BY_USERNAME_PREFIX_QUERY = "SELECT id FROM user WHERE username LIKE ? ESCAPE '\\' ORDER BY id"
+
+ACTIVE_DOCTORS_QUERY = """
+    SELECT id FROM user
+    WHERE level_id = 2 AND status = 1
+    ORDER BY id
+"""
+
+USER_FILTERS = (
+    ('level_id', 'level_id = ?', bind_value),
+    ('status', 'status = ?', bind_value),
+)
+
+USER_AFTER_CONDITION = 'id > ?'
+
+USER_INSERT_QUERY = 'INSERT INTO user (username, password, level_id, email, fullName, status) ' \
+                    'VALUES (?, ?, ?, ?, ?, ?)'
+
+# Every column, in the order of User.FIELDS
+USER_IMPORT_QUERY = 'INSERT INTO user (id, username, password, level_id, email, fullName, status) ' \
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)'
+
+USER_UPDATE_QUERY = 'UPDATE user ' \
+                    'SET username = ?, password = ?, level_id = ?, email = ?, fullName = ?, status = ? ' \
+                    'WHERE id = ?'
+
+# Only replaces the hash it was computed from, a concurrent password change wins
+USER_REHASH_QUERY = 'UPDATE user SET password = ? WHERE id = ? AND password = ?'
+
+USER_SET_STATUS_QUERY = 'UPDATE user SET status = ? WHERE id = ?'
+
+USER_DELETE_QUERY = 'DELETE FROM user WHERE id = ?'
+
+
+@lru_cache(maxsize=256)
+def select_columns(template, fields, allowed):
+    """
+        Fills the SELECT list of template with fields, which must all be in allowed.
+        The built text is cached, every projection keeps one statement text
+    """
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown columns {', '.join(map(str, unknown))}")
+
+    return template.format(columns=', '.join(fields), where='{where}')
+
+
+def build_list_query(template, fields, allowed, filters, filter_conditions, after_condition, after, sort_keys,
+                     limit):
+    """
+        Builds a listing query from fixed conditions, in a fixed order, and binds every value
+        Returns the query and its parameters
+    """
+    conditions = []
+    params = []
+    for name, condition, bind in filter_conditions:
+        if filters.get(name) is not None:
+            conditions.append(condition)
+            params.extend(bind(filters[name]))
+    if after is not None:
+        conditions.append(after_condition)
+        params.extend(decode_cursor(after, len(sort_keys)))
+
+    where = 'WHERE ' + ' AND '.join(conditions) + ' ' if conditions else ''
+    query = select_columns(template, tuple(fields), allowed).format(where=where)
+    if limit is not None:
+        query += ' LIMIT ?'
+        params.append(limit)
+
+    return query, params
+
+
+def escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+class Repository:
+    """
+        Runs a model's statements on a connection, rows are built as model instances
+    """
+    model = None
+    table = None
+    import_query = None
+
+    def __init__(self, db):
+        self.db = db
+
+    def execute(self, query, params=()):
+        # Through the connection's cursor factory, so statements are profiled
+        return self.db.cursor().execute(query, params)
+
+    def cursor(self):
+        cursor = self.db.cursor()
+        cursor.row_factory = self.model.row_factory
+
+        return cursor
+
+    def select(self, template, fields, params):
+        return self.cursor().execute(select_columns(template, tuple(fields), self.model.FIELDS), params)
+
+    def import_rows(self, rows):
+        """
+            Inserts rows holding every column of the model, in the order of its FIELDS, in one statement
+        """
+        self.db.cursor().executemany(self.import_query, rows)
+
+
+class AppointmentRepository(Repository):
+    model = Appointment
+    table = 'appointments'
+    import_query = APPOINTMENT_IMPORT_QUERY
+
+    def get(self, appointment_id, fields=Appointment.FIELDS):
+        """
+            Returns the live Appointment, None when it doesn't exist
+        """
+        return self.select(APPOINTMENT_GET_QUERY, fields, (appointment_id,)).fetchone()
+
+    def get_many(self, ids, fields=Appointment.FIELDS):
+        """
+            Returns the live Appointments of ids sorted by id, in a single query
+        """
+        return self.select(APPOINTMENT_GET_MANY_QUERY, fields, (json.dumps(list(ids)),)).fetchall()
+
+    def get_archived(self, appointment_id, fields=Appointment.FIELDS):
+        """
+            Returns the Appointment of the attached archive database, None when it's not archived
+        """
+        return self.select(ARCHIVED_APPOINTMENT_QUERY, fields, (appointment_id,)).fetchone()
+
+    @staticmethod
+    def list_query(filters, after=None, limit=None, fields=Appointment.FIELDS):
+        """
+            Builds the appointments listing query, sorted by schedule_time, id
+            filters: date, date_from, date_to as datetime.date, doctor_id, is_accepted, patient_name
+            after: cursor of the last row of the previous page
+        """
+        return build_list_query(APPOINTMENT_LIST_QUERY, fields, Appointment.FIELDS, filters, APPOINTMENT_FILTERS,
+                                APPOINTMENT_AFTER_CONDITION, after, APPOINTMENTS_SORT_KEYS, limit)
+
+    def list(self, filters, after=None, limit=None, fields=Appointment.FIELDS):
+        return self.cursor().execute(*self.list_query(filters, after, limit, fields))
+
+    def list_doctor_schedule(self, doctor_id, date_from, date_to):
+        """
+            Returns the (id, schedule_time) of the doctor's appointments from date_from to date_to, both included,
+            sorted by schedule_time
+        """
+        return self.execute(DOCTOR_SCHEDULE_QUERY, (doctor_id,) + bind_day_start(date_from) + bind_day_end(date_to))
+
+    def list_unassigned(self, schedule_from, schedule_to):
+        """
+            Returns the (id, schedule_time) of the appointments without doctor and not accepted,
+            scheduled from schedule_from to before schedule_to, sorted by schedule_time, id
+        """
+        return self.execute(UNASSIGNED_APPOINTMENTS_QUERY, (schedule_from, schedule_to)).fetchall()
+
+    def list_assigned(self, date_from, date_to):
+        """
+            Returns the (id, doctor_id, schedule_time) of the assigned appointments from date_from to date_to,
+            both included
+        """
+        return self.execute(ASSIGNED_APPOINTMENTS_QUERY, bind_day_start(date_from) + bind_day_end(date_to))
+
+    def count_for_day(self, doctor_id, day):
+        """
+            Returns the number of appointments of the doctor on day, None doctor_id for unassigned ones
+        """
+        res = self.execute(DAY_COUNT_QUERY, (doctor_id or 0, str(day))).fetchone()
+
+        return res[0] if res is not None else 0
+
+    def count_accepted_for_day(self, doctor_id, day):
+        res = self.execute(DAY_ACCEPTED_QUERY, (doctor_id, str(day))).fetchone()
+
+        return res[0] if res is not None else 0
+
+    def count_today(self):
+        """
+            Returns the number of appointments and of accepted appointments of the current day
+        """
+        return tuple(self.execute(TODAY_TOTALS_QUERY).fetchone())
+
+    def count_doctors_days(self, date_from, date_to):
+        """
+            Returns the (doctor_id, day, total) of the assigned appointments from date_from to date_to, both included
+        """
+        return self.execute(DOCTOR_DAILY_TOTALS_QUERY, (date_from.isoformat(), date_to.isoformat()))
+
+    def rebuild_daily_capacity(self):
+        """
+            Recomputes the doctor_daily_capacity counters from the appointments table
+            Returns the number of counter rows
+        """
+        self.execute(DAILY_CAPACITY_CLEAR_QUERY)
+
+        return self.execute(DAILY_CAPACITY_REBUILD_QUERY).rowcount
+
+    def read_booking_checks(self, patient_name, schedule_time, doctor_id):
+        return self.execute(BOOKING_CHECKS_QUERY, {
+            'patient_name': patient_name,
+            'schedule_time': schedule_time,
+            'doctor_id': doctor_id,
+        }).fetchone()
+
+    def read_assign_checks(self, appointment_id, doctor_id):
+        return self.execute(ASSIGN_CHECKS_QUERY, {'appointment_id': appointment_id, 'doctor_id': doctor_id}).fetchone()
+
+    def read_accept_checks(self, appointment_id, doctor_id):
+        return self.execute(ACCEPT_CHECKS_QUERY, {'appointment_id': appointment_id, 'doctor_id': doctor_id}).fetchone()
+
+    def read_reschedule_checks(self, appointment_id, patient_name, schedule_time, doctor_id):
+        return self.execute(RESCHEDULE_CHECKS_QUERY, {
+            'appointment_id': appointment_id,
+            'patient_name': patient_name,
+            'schedule_time': schedule_time,
+            'doctor_id': doctor_id,
+        }).fetchone()
+
+    def find_patient_appointments(self, patient_name, schedule_time):
+        """
+            Returns the ids of the patient's appointments at schedule_time
+        """
+        return [row[0] for row in self.execute(APPOINTMENT_PATIENT_SCHEDULE_QUERY, (patient_name, schedule_time))]
+
+    def is_assigned(self, appointment_id, doctor_id):
+        return self.execute(APPOINTMENT_DOCTOR_QUERY, (appointment_id, doctor_id)).fetchone() is not None
+
+    def create(self, patient_name, schedule_time, doctor_id):
+        return self.execute(APPOINTMENT_INSERT_QUERY, (patient_name, schedule_time, doctor_id)).lastrowid
+
+    def create_many(self, rows):
+        """
+            Inserts (patient_name, schedule_time, doctor_id) rows in one statement
+            Returns the id of the last one, the ids are contiguous while the write lock is held
+        """
+        self.db.cursor().executemany(APPOINTMENT_INSERT_QUERY, rows)
+
+        return self.execute(LAST_INSERT_ID_QUERY).fetchone()[0]
+
+    def update(self, appointment_id, schedule_time, patient_name, doctor_id, is_accepted):
+        self.execute(APPOINTMENT_UPDATE_QUERY, (schedule_time, patient_name, doctor_id, is_accepted, appointment_id))
+
+    def set_comments(self, appointment_id, comments):
+        self.execute(APPOINTMENT_SET_COMMENTS_QUERY, (comments, appointment_id))
+
+    def assign_doctor(self, appointment_id, doctor_id):
+        self.execute(APPOINTMENT_ASSIGN_QUERY, (doctor_id, appointment_id))
+
+    def assign_unassigned(self, assignments):
+        """
+            Assigns (appointment_id, doctor_id) pairs, skipping the appointments that have a doctor
+        """
+        self.db.cursor().executemany(APPOINTMENT_ASSIGN_UNASSIGNED_QUERY,
+                                     [(doctor_id, appointment_id) for appointment_id, doctor_id in assignments])
+
+    def accept(self, appointment_id, doctor_id):
+        self.execute(APPOINTMENT_ACCEPT_QUERY, (doctor_id, appointment_id))
+
+    def archive_batch(self, cutoff, batch_size):
+        """
+            Copies the batch_size oldest appointments scheduled before cutoff into the attached archive database
+            and deletes them from the live table, returns the number of moved rows
+        """
+        params = {'cutoff': cutoff.isoformat(), 'batch_size': batch_size}
+        self.execute(ARCHIVE_COPY_QUERY, params)
+
+        return self.execute(ARCHIVE_DELETE_QUERY, params).rowcount
+
+
+class UserRepository(Repository):
+    model = User
+    table = 'user'
+    import_query = USER_IMPORT_QUERY
+
+    def get(self, user_id, fields=User.FIELDS):
+        """
+            Returns the User, None when it doesn't exist
+        """
+        return self.select(USER_GET_QUERY, fields, (user_id,)).fetchone()
+
+    def get_many(self, ids, fields=User.FIELDS):
+        """
+            Returns the Users of ids sorted by id, in a single query
+        """
+        return self.select(USER_GET_MANY_QUERY, fields, (json.dumps(list(ids)),)).fetchall()
+
+    def get_by_username(self, username, fields=User.FIELDS):
+        return self.select(USER_BY_USERNAME_QUERY, fields, (username,)).fetchone()
+
+    @staticmethod
+    def list_query(filters, after=None, limit=None, fields=User.FIELDS):
+        """
+            Builds the users listing query, sorted by id
+            filters: level_id, status
+            after: cursor of the last row of the previous page
+        """
+        return build_list_query(USER_LIST_QUERY, fields, User.FIELDS, filters, USER_FILTERS,
+                                USER_AFTER_CONDITION, after, USERS_SORT_KEYS, limit)
+
+    def list(self, filters, after=None, limit=None, fields=User.FIELDS):
+        return self.cursor().execute(*self.list_query(filters, after, limit, fields))
+
+    def list_ids_by_username_prefix(self, prefix):
+        return [row[0] for row in self.execute(USER_BY_USERNAME_PREFIX_QUERY, (escape_like(prefix) + '%',))]
+
+    def list_active_doctor_ids(self):
+        return [row[0] for row in self.execute(ACTIVE_DOCTORS_QUERY)]
+
+    def create(self, username, password, level_id, email, full_name, status):
+        return self.execute(USER_INSERT_QUERY, (username, password, level_id, email, full_name, status)).lastrowid
+
+    def update(self, user_id, username, password, level_id, email, full_name, status):
+        self.execute(USER_UPDATE_QUERY, (username, password, level_id, email, full_name, status, user_id))
+
+    def rehash_password(self, user_id, new_hash, old_hash):
+        self.execute(USER_REHASH_QUERY, (new_hash, user_id, old_hash))
+
+    def set_status(self, user_id, status):
+        self.execute(USER_SET_STATUS_QUERY, (status, user_id))
+
+    def delete(self, user_id):
+        self.execute(USER_DELETE_QUERY, (user_id,))
@@ -1,20 +1,35 @@
-def get_appointment_data(db, appointment_id):
-    query = "SELECT * FROM appointments WHERE id = ?"
-    cursor = db.cursor()
-    res = cursor.execute(query, (appointment_id,))
-    res = res.fetchone()
+from app.models import Appointment
+from app.repositories import AppointmentRepository
+from app.services.archive import get_archived_appointment
+
+
+APPOINTMENT_FIELDS = Appointment.FIELDS
+# comments holds the doctor's findings, listings only read it when asked for
+APPOINTMENT_LIST_FIELDS = ('id', 'schedule_time', 'patient_name', 'doctor_id', 'is_accepted')
+
+
+def get_appointment_data(db, appointment_id, include_archive=True, fields=APPOINTMENT_FIELDS):
+    """
+        Returns the Appointment, looked up in the archive when it's not live
+        include_archive: False for appointments about to be updated, archived ones are read only
+        fields: columns to read, from APPOINTMENT_FIELDS
+    """
+    res = AppointmentRepository(db).get(appointment_id, fields)
+    if res is None and include_archive:
+        res = get_archived_appointment(db, appointment_id, fields)
 
     return res
 
 
 def get_curr_total_accepted_appointments(db):
-    cursor = db.cursor()
-    query = 'SELECT * FROM appointments ' \
-            'WHERE date(schedule_time) = CURRENT_DATE ' \
-            'AND is_accepted = 1'
+    return AppointmentRepository(db).count_today()[1]
 
-    results = cursor.execute(query).fetchall()
-    results = [dict(row) for row in results]
 
-    return len(results)
+def rebuild_doctor_daily_capacity(db):
+    """
+        Recomputes the doctor_daily_capacity counters from the appointments table
+    """
+    total = AppointmentRepository(db).rebuild_daily_capacity()
+    db.commit()
 
+    return total
@@ -0,0 +1,82 @@
+import os
+import sqlite3
+from flask import current_app
+from app.repositories import AppointmentRepository
+
+
+ARCHIVE_SCHEMA = 'archive'
+
+ARCHIVE_TABLE_QUERY = """
+    CREATE TABLE IF NOT EXISTS archive.appointments (
+      id INTEGER PRIMARY KEY,
+      schedule_time DATETIME NOT NULL,
+      patient_name TEXT NOT NULL,
+      doctor_id INTEGER,
+      comments TEXT,
+      is_accepted BOOLEAN default FALSE
+    )
+"""
+
+ARCHIVE_INDEX_QUERY = """
+    CREATE INDEX IF NOT EXISTS archive.idx_appointments_schedule
+      ON appointments (schedule_time)
+"""
+
+def get_archive_path():
+    return current_app.config['ARCHIVE_DATABASE']
+
+
+def attach_archive(db, create=False):
+    """
+        Attaches the archive database to the connection, once per connection
+        Returns False when there's no archive yet and create is not set
+    """
+    if db.execute('SELECT 1 FROM pragma_database_list WHERE name = ?', (ARCHIVE_SCHEMA,)).fetchone():
+        return True
+    path = get_archive_path()
+    if not create and not os.path.exists(path):
+        return False
+
+    # Attached databases are opened with the connection's flags, read-only connections stay read-only
+    db.execute(f'ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}', (path,))
+    if create:
+        db.execute(ARCHIVE_TABLE_QUERY)
+        db.execute(ARCHIVE_INDEX_QUERY)
+
+    return True
+
+
+def get_archived_appointment(db, appointment_id, fields):
+    """
+        Returns the archived Appointment with the given fields, None when it's not archived
+    """
+    if db.in_transaction or not attach_archive(db):
+        return None
+    try:
+        return AppointmentRepository(db).get_archived(appointment_id, fields)
+    except sqlite3.OperationalError:
+        # Archive file without archived appointments yet
+        return None
+
+
+def archive_appointments(db, cutoff, batch_size):
+    """
+        Moves the appointments scheduled before cutoff into the archive database,
+        batch_size rows per transaction, and returns the number of moved rows.
+        Rows are copied with INSERT OR REPLACE, so a run interrupted between
+        the archive and live commits is completed by running it again
+    """
+    attach_archive(db, create=True)
+    appointments = AppointmentRepository(db)
+    total = 0
+    while True:
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            moved = appointments.archive_batch(cutoff, batch_size)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        total += moved
+        if moved < batch_size:
+            return total
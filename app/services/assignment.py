@@ -0,0 +1,82 @@
+import bisect
+from datetime import date, datetime, timedelta
+from app.repositories import AppointmentRepository, UserRepository
+from app.services.availability import get_appointment_duration, parse_schedule_time, find_overlap
+from app.services.booking import run_in_transaction, is_over_booked
+
+
+def plan_assignments(appointments, doctor_ids, busy, loads, duration):
+    """
+        Greedily gives every appointment, in schedule order, to the least loaded doctor
+        of its day who is free at that time and not over-booked, by the same limit as booking
+        appointments: (appointment_id, schedule_time) sorted by schedule_time
+        busy: (doctor_id, day) -> sorted list of booked (start, end, appointment_id), updated in place
+        loads: (doctor_id, day) -> number of appointments, updated in place
+        Returns the (appointment_id, doctor_id, schedule_time) assignments and the ids left unassigned
+    """
+    assignments = []
+    unassigned = []
+    for appointment_id, schedule_time in appointments:
+        start = parse_schedule_time(schedule_time)
+        end = start + duration
+        day = start.date()
+        chosen = None
+        for doctor_id in doctor_ids:
+            load = loads.get((doctor_id, day), 0)
+            if is_over_booked(load):
+                continue
+            if chosen is not None and load >= chosen[0]:
+                continue
+            if find_overlap(busy.get((doctor_id, day), ()), start, end) is None:
+                chosen = (load, doctor_id)
+        if chosen is None:
+            unassigned.append(appointment_id)
+            continue
+
+        doctor_id = chosen[1]
+        bisect.insort(busy.setdefault((doctor_id, day), []), (start, end, appointment_id))
+        loads[(doctor_id, day)] = chosen[0] + 1
+        assignments.append((appointment_id, doctor_id, schedule_time))
+
+    return assignments, unassigned
+
+
+def _auto_assign(db, date_from, date_to, duration, dry_run):
+    repository = AppointmentRepository(db)
+    # Appointments already started are left alone, schedule times are UTC in ISO format
+    not_started = max(date_from.isoformat(), datetime.utcnow().isoformat(timespec='seconds'))
+    appointments = repository.list_unassigned(not_started, (date_to + timedelta(days=1)).isoformat())
+    if not appointments:
+        return [], []
+
+    doctor_ids = UserRepository(db).list_active_doctor_ids()
+    busy = {}
+    for appointment_id, doctor_id, schedule_time in repository.list_assigned(date_from, date_to):
+        start = parse_schedule_time(schedule_time)
+        busy.setdefault((doctor_id, start.date()), []).append((start, start + duration, appointment_id))
+    for intervals in busy.values():
+        intervals.sort()
+    loads = {}
+    for doctor_id, day, total in repository.count_doctors_days(date_from, date_to):
+        loads[(doctor_id, date.fromisoformat(day))] = total
+
+    assignments, unassigned = plan_assignments(appointments, doctor_ids, busy, loads, duration)
+    if assignments and not dry_run:
+        repository.assign_unassigned(
+            [(appointment_id, doctor_id) for appointment_id, doctor_id, _ in assignments])
+
+    return assignments, unassigned
+
+
+def auto_assign_appointments(db, date_from, date_to, dry_run=False):
+    """
+        Assigns the unassigned appointments from date_from to date_to, both included, not started yet,
+        to the active doctors in a single transaction
+        dry_run: computes the assignments without saving them
+        Returns the (appointment_id, doctor_id, schedule_time) assignments and the ids left unassigned
+    """
+    duration = get_appointment_duration()
+    if dry_run:
+        return _auto_assign(db, date_from, date_to, duration, dry_run)
+
+    return run_in_transaction(db, _auto_assign, date_from, date_to, duration, dry_run)
@@ -0,0 +1,111 @@
+import bisect
+from datetime import datetime, timedelta, date, time
+from flask import current_app
+from app.repositories import AppointmentRepository
+
+
+# Opening schedule, appointments start between 9:00 and 15:00 from Monday to Saturday
+OPENING_TIME = time(9, 0, 0)
+LAST_START_TIME = time(15, 0, 0)
+# python date().weekday(), 6 == Sunday, system is closed
+CLOSED_WEEKDAY = 6
+
+def parse_schedule_time(schedule_time):
+    """
+        Converts the stored UTC ISO format schedule_time into a naive datetime
+    """
+    if isinstance(schedule_time, datetime):
+        return schedule_time.replace(tzinfo=None)
+
+    # Removing Z from schedule_time ISO format
+    return datetime.fromisoformat(schedule_time.replace('Z', '')).replace(tzinfo=None)
+
+
+def find_overlap(intervals, start, end, exclude_id=None):
+    """
+        Returns the appointment id of the first interval overlapping [start, end)
+        intervals: list of (start, end, appointment_id) sorted by start
+    """
+    # Only intervals starting before the end can overlap
+    pos = bisect.bisect_left(intervals, (end,))
+    for interval_start, interval_end, appointment_id in reversed(intervals[:pos]):
+        if interval_end > start and appointment_id != exclude_id:
+            return appointment_id
+
+    return None
+
+
+def get_appointment_duration():
+    """
+        Length of every appointment, used for doctor's overlapping checks
+    """
+    return timedelta(minutes=current_app.config['APPOINTMENT_DURATION'])
+
+
+def is_open(day):
+    return day.weekday() != CLOSED_WEEKDAY
+
+
+def ceil_minute(value):
+    if value.second or value.microsecond:
+        return value.replace(second=0, microsecond=0) + timedelta(minutes=1)
+
+    return value
+
+
+def add_gap_slots(slots, free_from, free_to, last_start, length, booked):
+    """
+        Appends the slots of the given length fitting in [free_from, free_to) and starting at last_start
+        at the latest. Starts are one booking apart, so every slot can be booked, and each keeps
+        a whole booking free even when shorter than one
+    """
+    needed = max(length, booked)
+    start = ceil_minute(free_from)
+    while start <= last_start and start + needed <= free_to:
+        slots.append((start, start + length))
+        start += booked
+
+
+def get_doctor_free_slots(db, doctor_id, date_from, date_to, duration=None):
+    """
+        Returns the free (start, end) slots of the doctor from date_from to date_to, both included.
+        Booked appointments of the range are read in a single query and
+        subtracted from the opening schedule in one sweep, past days and slots already started are skipped
+        duration: slot length in minutes, defaults to the configured appointment duration.
+                  Slots end by the closing time, the last start plus one appointment
+    """
+    # schedule times are UTC
+    now = datetime.utcnow()
+    booked = get_appointment_duration()
+    length = booked if duration is None else timedelta(minutes=duration)
+    date_from = max(date_from, date.today())
+    if date_from > date_to:
+        return []
+
+    rows = AppointmentRepository(db).list_doctor_schedule(doctor_id, date_from, date_to)
+    starts = [parse_schedule_time(schedule_time) for _, schedule_time in rows]
+
+    slots = []
+    position = 0
+    day = date_from
+    while day <= date_to:
+        free_from = datetime.combine(day, OPENING_TIME)
+        last_start = datetime.combine(day, LAST_START_TIME)
+        closing = last_start + booked
+        # Appointments are sorted, so every one of the day is consumed once
+        while position < len(starts) and starts[position].date() == day:
+            busy_start = starts[position]
+            if is_open(day):
+                add_gap_slots(slots, free_from, busy_start, last_start, length, booked)
+            free_from = max(free_from, busy_start + booked)
+            position += 1
+        if is_open(day):
+            add_gap_slots(slots, free_from, closing, last_start, length, booked)
+        day += timedelta(days=1)
+
+    # Only the first slots of today can be in the past
+    past = 0
+    while past < len(slots) and slots[past][0] < now:
+        past += 1
+
+    return slots[past:]
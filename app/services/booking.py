@@ -0,0 +1,209 @@
+from app.repositories import AppointmentRepository
+from app.services.availability import get_appointment_duration, parse_schedule_time, find_overlap
+from app.utils.errors import BookingError
+from app.utils.metrics import count_validation_failure, count_capacity_rejection
+
+
+# Capacity limits of the current day
+MAX_CURR_TOTAL_APPOINTMENTS = 5
+MAX_CURR_TOTAL_ACCEPTED_APPOINTMENTS = 5
+MAX_DOCTOR_CURR_ACCEPTED_APPOINTMENTS = 3
+
+def reject(check, message):
+    # check: name of the matching validate_* function, so both are counted under one validator label
+    count_validation_failure(check, message)
+    raise BookingError(message)
+
+
+def reject_over_capacity(reason, message):
+    count_capacity_rejection(reason)
+    raise BookingError(message)
+
+
+def check_doctor_status(doctor_id, doctor_status):
+    # No row: doctor not exists, SQLITE3 stores boolean values True: 1, False: 0
+    if doctor_status is None:
+        reject('validate_doctor_status', f"Doctor with doctorId {doctor_id} not exists")
+    if doctor_status == 0:
+        reject('validate_doctor_status', f"Doctor {doctor_id} is not available at the moment")
+
+
+def read_doctor_day(db, doctor_id, schedule_time):
+    """
+        Returns the sorted (start, end, appointment_id) of the doctor's appointments on the day of schedule_time.
+        Read from the database inside the transaction, so the bookings of other workers are seen
+    """
+    duration = get_appointment_duration()
+    day = parse_schedule_time(schedule_time).date()
+    intervals = []
+    for row_id, row_schedule_time in AppointmentRepository(db).list_doctor_schedule(doctor_id, day, day):
+        start = parse_schedule_time(row_schedule_time)
+        intervals.append((start, start + duration, row_id))
+
+    return intervals
+
+
+def check_doctor_schedule(db, doctor_id, schedule_time, appointment_id=None):
+    """
+        Reads the doctor's appointments of the day inside the transaction and checks overlaps
+    """
+    duration = get_appointment_duration()
+    start = parse_schedule_time(schedule_time)
+    exclude_id = int(appointment_id) if appointment_id is not None else None
+    if find_overlap(read_doctor_day(db, doctor_id, schedule_time), start, start + duration, exclude_id) is not None:
+        reject('validate_doctor_appointments_schedule', f'Cannot assign the doctorId: {doctor_id} to an appointment, '
+                                  'Doctor is not available during this time')
+
+
+def is_over_booked(total_appointments):
+    """
+        The daily limit, shared by the booking checks and the auto-assignment planner
+    """
+    return total_appointments > MAX_CURR_TOTAL_APPOINTMENTS
+
+
+def check_over_booked(curr_total_appointments):
+    if is_over_booked(curr_total_appointments):
+        reject_over_capacity('doctor_over_booked', 'The doctor is currently over-booked')
+
+
+def check_acceptance_limits(checks):
+    """
+        checks: row with the curr_total_accepted_appointments and doctor_curr_accepted_appointments counters
+    """
+    # Checking of total accepted appointments limit
+    if checks['curr_total_accepted_appointments'] > MAX_CURR_TOTAL_ACCEPTED_APPOINTMENTS:
+        reject_over_capacity('appointment_acceptance_limit', "Appointment acceptance limit")
+    # Checking of doctor's total accepted appointments limit
+    if checks['doctor_curr_accepted_appointments'] > MAX_DOCTOR_CURR_ACCEPTED_APPOINTMENTS:
+        reject_over_capacity('doctor_acceptance_limit', "Doctor acceptance limit")
+
+
+def run_in_transaction(db, func, *args):
+    """
+        Runs func inside a BEGIN IMMEDIATE transaction, so its checks and
+        its write can't interleave with another writer
+    """
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        result = func(db, *args)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return result
+
+
+def _book_appointment(db, data):
+    appointments = AppointmentRepository(db)
+    checks = appointments.read_booking_checks(data['patient_name'], data['schedule_time'], data['doctor_id'])
+    # Checking if patient's appointment not overlapping
+    if checks['patient_appointments'] >= 1:
+        reject('validate_patient_appointments_schedule', 'Cannot create an appointment, '
+                                   'Patient does have existing appointment on the same time')
+    if data['doctor_id'] is not None:
+        # Checking if doctor exists and available
+        check_doctor_status(data['doctor_id'], checks['doctor_status'])
+        # Checking if doctor's appointments not overlapping
+        check_doctor_schedule(db, data['doctor_id'], data['schedule_time'])
+        # Checking if doctor is over-booked
+        check_over_booked(checks['curr_total_appointments'])
+
+    return appointments.create(data["patient_name"], data["schedule_time"], data["doctor_id"])
+
+
+def book_appointment(db, data):
+    """
+        Checks and creates an appointment in a single transaction
+        data: validated payload with schedule_time, patient_name and doctor_id
+        Returns the new appointment id, raises BookingError when a check fails
+    """
+    params = {
+        'patient_name': data['patient_name'],
+        'schedule_time': data['schedule_time'],
+        'doctor_id': data['doctor_id'],
+    }
+    return run_in_transaction(db, _book_appointment, params)
+
+
+def _assign_appointment_doctor(db, appointment_id, doctor_id):
+    appointments = AppointmentRepository(db)
+    checks = appointments.read_assign_checks(appointment_id, doctor_id)
+    # Checking if appointment exists
+    if checks['schedule_time'] is None:
+        reject('validate_appointment', f"Appointment {appointment_id} not exists")
+    # Checking if doctor exists and available
+    check_doctor_status(doctor_id, checks['doctor_status'])
+    # Checking doctor's appointment based on schedule_time
+    check_doctor_schedule(db, doctor_id, checks['schedule_time'], appointment_id)
+    # Checking if doctor is over-booked
+    check_over_booked(checks['curr_total_appointments'])
+
+    appointments.assign_doctor(appointment_id, doctor_id)
+
+
+def assign_appointment_doctor(db, appointment_id, doctor_id):
+    """
+        Checks and assigns a doctor to an appointment in a single transaction
+        Raises BookingError when a check fails
+    """
+    run_in_transaction(db, _assign_appointment_doctor, appointment_id, doctor_id)
+
+
+def _accept_appointment(db, doctor_id, appointment_id):
+    appointments = AppointmentRepository(db)
+    checks = appointments.read_accept_checks(appointment_id, doctor_id)
+    # Checking if doctor exists and available
+    check_doctor_status(doctor_id, checks['doctor_status'])
+    # Checking if doctor that will accepts is assigned to this appointment
+    if checks['doctor_appointment'] == 0:
+        reject('validate_doctor_appointment', "UnAuthorized Doctor: This Doctor is not assigned to this appointment")
+    check_acceptance_limits(checks)
+
+    appointments.accept(appointment_id, doctor_id)
+
+
+def accept_appointment(db, doctor_id, appointment_id):
+    """
+        Checks and accepts an appointment for its doctor in a single transaction
+        Raises BookingError when a check fails
+    """
+    run_in_transaction(db, _accept_appointment, doctor_id, appointment_id)
+
+
+def _reschedule_appointment(db, appointment_id, schedule_time, patient_name, doctor_id, is_accepted):
+    appointments = AppointmentRepository(db)
+    current = appointments.get(appointment_id, fields=('schedule_time', 'doctor_id', 'is_accepted'))
+    # Checking if appointment exists and is still not accepted
+    if current is None:
+        reject('validate_appointment', f"Appointment {appointment_id} not exists")
+    if current.is_accepted == 1:
+        reject('validate_appointment', "Cannot Update Accepted Appointments")
+    checks = appointments.read_reschedule_checks(appointment_id, patient_name, schedule_time, doctor_id)
+    schedule_changed = schedule_time != current.schedule_time
+    # Checking if patient's other appointments not overlapping
+    if checks['patient_appointments'] >= 1:
+        reject('validate_patient_appointments_schedule', 'Cannot create an appointment, '
+                                   'Patient does have existing appointment on the same time')
+    if doctor_id is not None and (schedule_changed or doctor_id != current.doctor_id):
+        # Checking if doctor exists and available
+        check_doctor_status(doctor_id, checks['doctor_status'])
+        # Checking if doctor's appointments not overlapping, from the database as other workers may have booked
+        check_doctor_schedule(db, doctor_id, schedule_time, appointment_id)
+    if is_accepted:
+        # Same limits as accept_appointment, counted in the same transaction as the write
+        check_acceptance_limits(checks)
+        # Checking if doctor is over-booked
+        check_over_booked(checks['curr_total_appointments'])
+
+    appointments.update(appointment_id, schedule_time, patient_name, doctor_id, is_accepted)
+
+
+def reschedule_appointment(db, appointment_id, schedule_time, patient_name, doctor_id, is_accepted):
+    """
+        Checks and saves the new schedule, patient, doctor and status of an appointment in a single transaction
+        Raises BookingError when a check fails
+    """
+    run_in_transaction(db, _reschedule_appointment, appointment_id, schedule_time, patient_name, doctor_id,
+                       is_accepted)
@@ -0,0 +1,99 @@
+import hashlib
+import hmac
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+from app.utils.errors import GeneralError
+from app.utils.metrics import metrics
+
+
+metrics.describe('password_hasher_rejections_total', 'counter', 'Password operations rejected by a full hashing queue')
+
+
+def is_password_hash(stored):
+    """
+        Tells a werkzeug 'method$salt$hash' string from a legacy plaintext password
+    """
+    parts = stored.split('$')
+    if len(parts) != 3:
+        return False
+
+    return parts[0].startswith('pbkdf2:') or parts[0] in hashlib.algorithms_guaranteed
+
+
+class PasswordHasher:
+    """
+        Salted password hashing on a bounded pool of worker threads.
+        Hashing is CPU heavy, so only `workers` hashes run at once and
+        at most `queue_size` more wait for a worker, others are rejected
+    """
+
+    def __init__(self, method, salt_length, workers, queue_size):
+        self.salt_length = salt_length
+        self._method = method
+        # Hash of an empty password, verified for unknown users so they take as long as known ones
+        self._dummy_hash = self._hash('')
+        # werkzeug adds the default iterations to the method, stored hashes carry the full method
+        self.method = self._dummy_hash.split('$', 1)[0]
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hasher')
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+
+    def _hash(self, password):
+        return generate_password_hash(password, self._method, self.salt_length)
+
+    def _verify(self, stored, password):
+        if stored is None:
+            check_password_hash(self._dummy_hash, password)
+            return False, None
+        if is_password_hash(stored):
+            if not check_password_hash(stored, password):
+                return False, None
+            if stored.split('$', 1)[0] == self.method:
+                return True, None
+        # Legacy plaintext password
+        elif not hmac.compare_digest(stored.encode('utf8'), password.encode('utf8')):
+            return False, None
+
+        return True, self._hash(password)
+
+    def _run(self, func, *args):
+        if not self._slots.acquire(blocking=False):
+            metrics.inc('password_hasher_rejections_total')
+            raise GeneralError('Too many concurrent logins, please retry later', 'warning', 503)
+        try:
+            future = self._executor.submit(func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+
+        return future.result()
+
+    def hash_password(self, password):
+        """
+            Returns the salted hash of the password made with the configured method
+        """
+        return self._run(self._hash, password)
+
+    def verify_password(self, stored, password):
+        """
+            Checks a password against the stored hash or legacy plaintext password
+            stored: None for an unknown user
+            Returns (valid, new hash), new hash is set when the stored password
+            is plaintext or was hashed with another method and must be replaced
+        """
+        return self._run(self._verify, stored, password)
+
+
+def get_password_hasher():
+    return current_app.extensions['password_hasher']
+
+
+def init_app(app):
+    app.extensions['password_hasher'] = PasswordHasher(
+        app.config['PASSWORD_HASH_METHOD'],
+        app.config['PASSWORD_SALT_LENGTH'],
+        app.config['PASSWORD_HASH_WORKERS'],
+        app.config['PASSWORD_HASH_QUEUE_SIZE'],
+    )
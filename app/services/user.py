@@ -1,31 +1,23 @@
-def get_user_data(db, user_id):
-    query = "SELECT * FROM user WHERE id = ?"
-    cursor = db.cursor()
-    res = cursor.execute(query, (user_id,))
-    res = res.fetchone()
+from datetime import datetime
+from app.models import User
+from app.repositories import AppointmentRepository, UserRepository
 
-    return res
 
+# password is never sent back
+USER_FIELDS = tuple(field for field in User.FIELDS if field != 'password')
 
-def get_doctor_curr_total_appointments(db):
-    cursor = db.cursor()
-    query = 'SELECT * FROM appointments ' \
-            'WHERE date(schedule_time) = CURRENT_DATE '
-
-    results = cursor.execute(query).fetchall()
-    results = [dict(row) for row in results]
 
-    return len(results)
+def get_user_data(db, user_id, fields=USER_FIELDS):
+    """
+        Returns the User with the given fields, None when it doesn't exist
+    """
+    return UserRepository(db).get(user_id, fields)
 
 
-def get_doctor_curr_total_accepted_appointments(db, doctor_id):
-    cursor = db.cursor()
-    query = 'SELECT * FROM appointments ' \
-            'WHERE doctor_id = ? ' \
-            'AND date(schedule_time) = CURRENT_DATE ' \
-            'AND is_accepted = 1'
-    results = cursor.execute(query, (doctor_id,)).fetchall()
-    results = [dict(row) for row in results]
+def get_doctor_curr_total_appointments(db):
+    return AppointmentRepository(db).count_today()[0]
 
-    return len(results)
 
+def get_doctor_curr_total_accepted_appointments(db, doctor_id):
+    # The current day of sqlite's CURRENT_DATE, in UTC
+    return AppointmentRepository(db).count_accepted_for_day(doctor_id, datetime.utcnow().date())
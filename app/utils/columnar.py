@@ -0,0 +1,36 @@
+from .errors import InvalidBodyError
+
+
+RESPONSE_FORMATS = ('rows', 'columnar')
+
+
+def wants_columnar(args):
+    """
+        Reads the format query arg, rows by default
+    """
+    response_format = args.get("format", default='rows', type=str)
+    if response_format not in RESPONSE_FORMATS:
+        raise InvalidBodyError(f"format must be one of {', '.join(RESPONSE_FORMATS)}")
+
+    return response_format == 'columnar'
+
+
+def fetch_tuples(cursor, query, params):
+    """
+        Runs the query returning plain tuples instead of sqlite3.Row
+        Returns the column names and the rows
+    """
+    cursor.row_factory = None
+    rows = cursor.execute(query, params).fetchall()
+
+    return [column[0] for column in cursor.description], rows
+
+
+def to_columnar(columns, rows):
+    """
+        Column names once and one array of values per column
+    """
+    return {
+        'columns': columns,
+        'values': list(zip(*rows)) if rows else [[] for _ in columns],
+    }
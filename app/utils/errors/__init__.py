@@ -2,7 +2,9 @@ import logging
 from flask import jsonify
 from .general_error import GeneralError
 from .invalid_body_error import InvalidBodyError
+from .booking_error import BookingError
 
+__all__ = ['GeneralError', 'InvalidBodyError', 'BookingError', 'register_errors']
 
 def register_errors(app):
     @app.errorhandler(500)
@@ -0,0 +1,10 @@
+# Error handler
+class BookingError(Exception):
+    """
+        This is for appointments rejected by the booking checks
+    """
+
+    def __init__(self, error):
+        self.error = error
+        self.severity = 'info'
+        self.status_code = 404
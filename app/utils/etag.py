@@ -0,0 +1,45 @@
+from flask import Response, g, request
+
+
+TABLE_VERSIONS_QUERY = 'SELECT version FROM table_versions WHERE name IN ({}) ORDER BY name'
+
+BUMP_TABLE_VERSION_QUERY = 'UPDATE table_versions SET version = version + 1 WHERE name = ?'
+
+
+def get_etag(db, *tables):
+    """
+        Builds the ETag of a read from the versions of the tables it reads,
+        bumped by triggers on every write, and the caller's identity
+    """
+    query = TABLE_VERSIONS_QUERY.format(', '.join('?' * len(tables)))
+    versions = [str(row[0]) for row in db.execute(query, tables)]
+    auth_data = g.get('auth_data') or {}
+
+    return '-'.join(versions + [str(auth_data.get('id')), str(auth_data.get('level_id'))])
+
+
+def bump_table_version(db, table):
+    """
+        Invalidates the ETags of table, for writes made while its version triggers were dropped
+    """
+    with db:
+        db.execute(BUMP_TABLE_VERSION_QUERY, (table,))
+
+
+def not_modified(etag):
+    """
+        Returns a 304 response when the client already holds this ETag, None otherwise
+    """
+    if not request.if_none_match.contains_weak(etag):
+        return None
+
+    response = Response(status=304)
+    response.set_etag(etag, weak=True)
+
+    return response
+
+
+def with_etag(response, etag):
+    response.set_etag(etag, weak=True)
+
+    return response
@@ -0,0 +1,20 @@
+from .errors import InvalidBodyError
+
+
+def get_fields(args, allowed, default, required=()):
+    """
+        Reads the comma separated fields query arg, checked against the allowed columns
+        Returns the columns to select, in allowed order, required columns are always selected
+    """
+    value = args.get("fields", default=None, type=str)
+    if value is None:
+        fields = set(default)
+    else:
+        fields = {field.strip() for field in value.split(',') if field.strip()}
+        unknown = fields.difference(allowed)
+        if unknown:
+            raise InvalidBodyError(f"Unknown fields {', '.join(sorted(unknown))}, "
+                                   f"allowed fields are {', '.join(allowed)}")
+    fields.update(required)
+
+    return tuple(column for column in allowed if column in fields)
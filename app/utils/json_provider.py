@@ -0,0 +1,69 @@
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def to_json_default(obj):
+    """
+        Serializes models through their to_json method, other types like the default provider
+    """
+    to_json = getattr(obj, 'to_json', None)
+    if to_json is not None:
+        return to_json()
+
+    return DefaultJSONProvider.default(obj)
+
+
+class OrJSONProvider(DefaultJSONProvider):
+    """
+        JSON provider serializing with orjson when it's installed,
+        falls back to the default provider otherwise.
+        Dates keep the default provider's format, so responses don't change.
+        Models are serialized with their to_json method
+    """
+    default = staticmethod(to_json_default)
+
+    def _orjson_options(self):
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+
+        return options
+
+    def dumps_bytes(self, obj):
+        """
+            Serializes obj into UTF-8 JSON bytes
+        """
+        if orjson is not None:
+            try:
+                return orjson.dumps(obj, default=self.default, option=self._orjson_options())
+            except orjson.JSONEncodeError:
+                # e.g. integers over 64 bits, which the json module supports
+                pass
+
+        return super().dumps(obj).encode('utf8')
+
+    def dumps(self, obj, **kwargs):
+        # Formatting arguments like indent are only supported by the json module
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+
+        return self.dumps_bytes(obj).decode('utf8')
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        # Pretty printed responses in debug mode
+        if orjson is None or self.compact is False or (self.compact is None and self._app.debug):
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+
+        return self._app.response_class(self.dumps_bytes(obj) + b'\n', mimetype=self.mimetype)
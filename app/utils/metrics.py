@@ -0,0 +1,175 @@
+import bisect
+import re
+import threading
+from functools import wraps
+
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in labels) + '}'
+
+
+class MetricsRegistry:
+    """
+        Prometheus style counters and histograms.
+        Every thread writes into its own shard without locking,
+        shards are only summed when the metrics are collected
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._descriptions = {}
+        self._local = threading.local()
+        # (thread, counters, histograms) of every thread that recorded a metric
+        self._shards = []
+        # Merged shards of finished threads
+        self._retired = ({}, {})
+        self._lock = threading.Lock()
+
+    def describe(self, name, metric_type, description):
+        self._descriptions[name] = (metric_type, description)
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = ({}, {})
+            self._local.shard = shard
+            with self._lock:
+                # Keeps the shards bounded by the live threads, with a thread per request too
+                self._retire_finished()
+                self._shards.append((threading.current_thread(), shard))
+
+        return shard
+
+    def inc(self, name, value=1, **labels):
+        counters = self._shard()[0]
+        key = (name, tuple(sorted(labels.items())))
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        histograms = self._shard()[1]
+        key = (name, tuple(sorted(labels.items())))
+        histogram = histograms.get(key)
+        if histogram is None:
+            # One count per bucket, the +Inf bucket, then the sum
+            histogram = histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        histogram[bisect.bisect_left(self.buckets, value)] += 1
+        histogram[-1] += value
+
+    @staticmethod
+    def _merge(target, counters, histograms):
+        for key, value in counters.items():
+            target[0][key] = target[0].get(key, 0) + value
+        for key, values in histograms.items():
+            merged = target[1].get(key)
+            if merged is None:
+                target[1][key] = list(values)
+            else:
+                for position, value in enumerate(values):
+                    merged[position] += value
+
+    def _retire_finished(self):
+        """
+            Merges the shards of finished threads into the retired totals, called with the lock held
+        """
+        alive = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                alive.append((thread, shard))
+            else:
+                # Finished threads won't write anymore
+                self._merge(self._retired, *shard)
+        self._shards = alive
+
+    def collect(self):
+        """
+            Returns the (counters, histograms) summed over every thread
+        """
+        with self._lock:
+            self._retire_finished()
+            totals = ({}, {})
+            self._merge(totals, *self._retired)
+            for _, (counters, histograms) in self._shards:
+                self._merge(totals, counters.copy(), {key: list(values) for key, values in histograms.copy().items()})
+
+        return totals
+
+    def render(self, extra=()):
+        """
+            Renders every metric in the Prometheus text exposition format
+            extra: (name, type, description, [(labels dict, value)]) computed by the caller
+        """
+        counters, histograms = self.collect()
+        # name -> [(rendered labels, lines)], a histogram's lines stay in bucket order
+        families = {}
+        for (name, labels), value in counters.items():
+            families.setdefault(name, []).append((format_labels(labels), [f'{name}{format_labels(labels)} {value}']))
+        for (name, labels), values in histograms.items():
+            lines = []
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), values):
+                cumulative += count
+                lines.append(f'{name}_bucket{format_labels(labels + (("le", bound),))} {cumulative}')
+            lines.append(f'{name}_sum{format_labels(labels)} {values[-1]}')
+            lines.append(f'{name}_count{format_labels(labels)} {cumulative}')
+            families.setdefault(name, []).append((format_labels(labels), lines))
+
+        output = []
+        for name in sorted(families):
+            metric_type, description = self._descriptions.get(name, ('untyped', name))
+            output.append(f'# HELP {name} {description}')
+            output.append(f'# TYPE {name} {metric_type}')
+            for _, lines in sorted(families[name], key=lambda series: series[0]):
+                output.extend(lines)
+        for name, metric_type, description, samples in extra:
+            output.append(f'# HELP {name} {description}')
+            output.append(f'# TYPE {name} {metric_type}')
+            output.extend(f'{name}{format_labels(sorted(labels.items()))} {value}' for labels, value in samples)
+
+        return '\n'.join(output) + '\n'
+
+
+metrics = MetricsRegistry()
+metrics.describe('http_requests_total', 'counter', 'Requests by endpoint, method and status code')
+metrics.describe('http_request_duration_seconds', 'histogram', 'Request latency by endpoint, method and status code')
+metrics.describe('db_queries_total', 'counter', 'sql statements executed')
+metrics.describe('db_query_duration_seconds_total', 'counter', 'Time spent executing sql statements')
+metrics.describe('db_connections_opened_total', 'counter', 'sqlite connections opened')
+metrics.describe('db_connections_closed_total', 'counter', 'sqlite connections closed')
+metrics.describe('validation_failures_total', 'counter', 'Failed validations by validator and message')
+metrics.describe('capacity_rejections_total', 'counter', 'Appointments rejected by capacity limits')
+
+
+def count_validation_failures(func):
+    """
+        Counts the failures of a validate_* function, which returns an error
+        message or False when validation fails. Ids in messages are replaced by N
+    """
+    @wraps(func)
+    def decorated(*args, **kwargs):
+        result = func(*args, **kwargs)
+        if isinstance(result, str):
+            count_validation_failure(func.__name__, result)
+        elif result is False:
+            count_validation_failure(func.__name__, 'invalid')
+
+        return result
+
+    return decorated
+
+
+def count_validation_failure(validator, message):
+    metrics.inc('validation_failures_total', validator=validator, message=re.sub(r'\d+', 'N', message))
+
+
+def count_capacity_rejection(reason):
+    metrics.inc('capacity_rejections_total', reason=reason)
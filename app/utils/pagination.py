@@ -0,0 +1,70 @@
+import base64
+import json
+from .errors import InvalidBodyError
+
+
+DEFAULT_PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 500
+
+
+def get_page_limit(args):
+    """
+        Reads the limit query arg, bounded to MAX_PAGE_LIMIT
+    """
+    limit = args.get("limit", default=DEFAULT_PAGE_LIMIT, type=int)
+    if limit < 1:
+        raise InvalidBodyError("limit must be a positive number")
+
+    return min(limit, MAX_PAGE_LIMIT)
+
+
+def encode_cursor(values):
+    """
+        Encodes the sort key values of the last returned row into an opaque cursor
+    """
+    raw = json.dumps(list(values), separators=(',', ':')).encode('utf8')
+
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_cursor(cursor, size):
+    """
+        Decodes a cursor made by encode_cursor, it must hold exactly size values
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, UnicodeError):
+        raise InvalidBodyError("Invalid after cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidBodyError("Invalid after cursor")
+
+    return values
+
+
+def parse_bool_arg(value):
+    """
+        Converts query arg values like true/false/1/0 into boolean
+    """
+    if value is None:
+        return None
+    value = value.lower()
+    if value in ('true', '1'):
+        return True
+    if value in ('false', '0'):
+        return False
+
+    raise InvalidBodyError(f"Invalid boolean value {value}")
+
+
+def paginate(rows, limit, sort_keys, columns=None):
+    """
+        Splits rows fetched with limit + 1 into the page and its next cursor
+        columns: column names of tuple rows, sort keys are then looked up by position
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    if columns is not None:
+        sort_keys = [columns.index(key) for key in sort_keys]
+
+    return rows, encode_cursor(rows[-1][key] for key in sort_keys)
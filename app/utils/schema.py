@@ -0,0 +1,29 @@
+from jsonschema.exceptions import best_match
+from jsonschema.validators import validator_for
+
+
+# Schema name -> validator, compiled once when the schema is registered
+_validators = {}
+
+
+def register_schema(name, schema):
+    """
+        Checks the schema once and keeps a reusable validator for it
+    """
+    cls = validator_for(schema)
+    cls.check_schema(schema)
+    _validators[name] = cls(schema)
+
+    return schema
+
+
+def get_schema_error(name, data):
+    """
+        Validates data against a registered schema
+        Returns the error_msg of the failing schema, or None when data is valid
+    """
+    error = best_match(_validators[name].iter_errors(data))
+    if error is None:
+        return None
+
+    return error.schema["error_msg"] if "error_msg" in error.schema else error.message
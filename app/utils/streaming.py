@@ -0,0 +1,28 @@
+from flask import Response, current_app, request, stream_with_context
+
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+
+
+def wants_stream():
+    """
+        Streaming is requested through ?stream=1 or Accept: application/x-ndjson
+    """
+    if request.args.get("stream", default=None, type=str) in ('1', 'true'):
+        return True
+
+    return request.accept_mimetypes.best == NDJSON_MIMETYPE
+
+
+def stream_ndjson(cursor):
+    """
+        Streams the rows of an executed cursor, one JSON document per line.
+        Rows are pulled from sqlite one at a time so memory stays constant
+        Rows must be serializable by the app's JSON provider, like models
+    """
+    def generate():
+        dumps = current_app.json.dumps
+        for row in cursor:
+            yield dumps(row) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
@@ -0,0 +1,215 @@
+"""
+    Endpoint benchmark suite
+
+    Seeds a throw-away database with `flask seed-db`, then drives every
+    blueprint route through the Flask test client and reports the
+    p50/p95/p99 latency and the sqlite queries per request of each route
+
+    $ python -m benchmarks.endpoints --requests 200 --months 3
+"""
+import argparse
+import logging
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from collections import Counter
+from datetime import date, timedelta
+from app import create_app
+from app.db import init_db
+
+
+class QueryCounter:
+    """
+        Counts the statements run on a sqlite connection, trigger bodies excluded
+    """
+
+    def __init__(self):
+        self.total = 0
+
+    def __call__(self, statement):
+        if not statement.startswith('--'):
+            self.total += 1
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    position = min(len(values) - 1, round(pct / 100 * (len(values) - 1)))
+
+    return values[position]
+
+
+def next_opening_day(rng):
+    day = date.today() + timedelta(days=rng.randint(1, 28))
+    # python date().weekday(), if value is 6 == Sunday, system is closed
+    if day.weekday() == 6:
+        day += timedelta(days=1)
+
+    return day
+
+
+def random_schedule(rng):
+    return f'{next_opening_day(rng).isoformat()}T{rng.randint(9, 14):02d}:{rng.choice((0, 30)):02d}:00Z'
+
+
+def get_scenarios(rng, doctor_ids, max_appointment_id, assigned, read_bench_user_ids):
+    """
+        (name, user, factory) per route, factory(i) returns the (method, url, json payload) of request i
+        assigned: (appointment_id, doctor_id) of assigned appointments
+        read_bench_user_ids: returns the ids of the users created by POST /user
+    """
+    bench_user_ids = []
+
+    def appointment_id():
+        return rng.randint(1, max_appointment_id)
+
+    def doctor_id():
+        return rng.choice(doctor_ids)
+
+    def bench_user_id(i):
+        # Read once POST /user ran, request i updates and then deletes the i-th one
+        if not bench_user_ids:
+            bench_user_ids.extend(read_bench_user_ids())
+        return bench_user_ids[i % len(bench_user_ids)]
+
+    def findings(i):
+        appointment, doctor = rng.choice(assigned)
+        return 'PUT', '/appointment/findings', {
+            'appointment_id': appointment, 'doctor_id': doctor, 'comments': 'Benchmark findings'
+        }
+
+    return (
+        ('GET /', 'admin', lambda i: ('GET', '/', None)),
+        ('GET /metrics', None, lambda i: ('GET', '/metrics', None)),
+        ('POST /auth', None, lambda i: ('POST', '/auth', {'username': 'scheduler1', 'password': 'scheduler1'})),
+        ('GET /users', 'admin', lambda i: ('GET', '/users', None)),
+        ('POST /user', 'admin', lambda i: ('POST', '/user', {
+            'username': f'bench{i}', 'password': f'bench{i}', 'level_id': 1, 'email': f'bench{i}@bench.local',
+            'full_name': f'Bench {i}', 'fullName': f'Bench {i}'
+        })),
+        ('PUT /user/<id>', 'admin', lambda i: ('PUT', f'/user/{bench_user_id(i)}', {
+            'email': f'bench{i}@renamed.local', 'full_name': f'Bench Renamed {i}', 'fullName': f'Bench Renamed {i}'
+        })),
+        ('GET /appointments', 'scheduler1', lambda i: ('GET', '/appointments', None)),
+        ('GET /appointments?doctor_id', 'scheduler1', lambda i: (
+            'GET', f'/appointments?doctor_id={doctor_id()}&date_from={date.today()}', None
+        )),
+        ('GET /appointment', 'scheduler1', lambda i: ('GET', f'/appointment?appointment_id={appointment_id()}', None)),
+        ('GET /doctors/<id>/availability', 'scheduler1', lambda i: (
+            'GET', f'/doctors/{doctor_id()}/availability?from={next_opening_day(rng)}', None
+        )),
+        ('POST /appointment', 'scheduler1', lambda i: ('POST', '/appointment', {
+            'patient_name': f'bench patient {i}', 'schedule_time': random_schedule(rng), 'doctor_id': doctor_id()
+        })),
+        ('POST /appointments/bulk', 'scheduler1', lambda i: ('POST', '/appointments/bulk', [
+            {'patient_name': f'bench bulk {i}-{n}', 'schedule_time': random_schedule(rng), 'doctor_id': doctor_id()}
+            for n in range(20)
+        ])),
+        ('PATCH /appointment/<id>', 'scheduler1', lambda i: (
+            'PATCH', f'/appointment/{appointment_id()}', {'patient_name': f'bench renamed {i}'}
+        )),
+        ('PUT /appointment/<id>/assign', 'scheduler1', lambda i: (
+            'PUT', f'/appointment/{appointment_id()}/assign/doctor/{doctor_id()}', None
+        )),
+        ('POST /appointments/auto-assign', 'scheduler1', lambda i: (
+            'POST', f'/appointments/auto-assign?from={next_opening_day(rng)}&dry_run=1', None
+        )),
+        # Request i deactivates then re-activates the same doctor, so the later routes see every doctor active
+        ('PUT /deactivate/doctor/<id>', 'admin', lambda i: (
+            'PUT', f'/deactivate/doctor/{doctor_ids[i % len(doctor_ids)]}', None
+        )),
+        ('PUT /activate/doctor/<id>', 'admin', lambda i: (
+            'PUT', f'/activate/doctor/{doctor_ids[i % len(doctor_ids)]}', None
+        )),
+        ('PUT /doctor/<id>/accept/<id>', 'doctor1', lambda i: (
+            'PUT', f'/doctor/{doctor_id()}/accept/{appointment_id()}', None
+        )),
+        ('PUT /appointment/findings', 'doctor1', findings),
+        ('DELETE /user/<id>', 'admin', lambda i: ('DELETE', f'/user/{bench_user_id(i)}', None)),
+    )
+
+
+def build_app(database, months, doctors):
+    app = create_app({
+        'TESTING': True,
+        'DATABASE': database,
+        'JWT_SECRET': 'benchmark',
+        # Report server errors as 500 responses instead of raising them
+        'PROPAGATE_EXCEPTIONS': False,
+    })
+    with app.app_context():
+        init_db()
+        result = app.test_cli_runner().invoke(args=['seed-db', '--months', str(months),
+                                                    '--doctors', str(doctors), '--seed', '1'])
+        if result.exception is not None:
+            raise result.exception
+        print(result.output.strip())
+
+    return app
+
+
+def run(requests, months, doctors):
+    logging.disable(logging.CRITICAL)
+    database = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    app = build_app(database, months, doctors)
+    client = app.test_client()
+    rng = random.Random(1)
+
+    tokens = {}
+    for username in ('admin', 'scheduler1', 'doctor1'):
+        response = client.post('/auth', json={'username': username, 'password': username})
+        tokens[username] = response.json['token']
+
+    with app.app_context():
+        # Requests run one at a time, so each pool hands them back its single idle connection
+        pools = [app.extensions[name] for name in ('sqlite_pool', 'sqlite_read_pool') if name in app.extensions]
+        connections = [pool.acquire() for pool in pools]
+        doctor_ids = [row[0] for row in connections[0].execute('SELECT id FROM user WHERE level_id = 2')]
+        max_appointment_id = connections[0].execute('SELECT MAX(id) FROM appointments').fetchone()[0]
+        assigned = connections[0].execute('SELECT id, doctor_id FROM appointments WHERE doctor_id IS NOT NULL').fetchall()
+        for pool, connection in zip(pools, connections):
+            pool.release(connection)
+    # Reads go through the read-only pool, writes through the other one
+    counter = QueryCounter()
+    for connection in connections:
+        connection.set_trace_callback(counter)
+
+    # Its own connection, so these reads aren't counted
+    lookup = sqlite3.connect(database)
+
+    def read_bench_user_ids():
+        return [row[0] for row in lookup.execute("SELECT id FROM user WHERE username LIKE 'bench%' ORDER BY id")]
+
+    print(f"{'route':<34}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}  statuses")
+    for name, user, scenario in get_scenarios(rng, doctor_ids, max_appointment_id, assigned, read_bench_user_ids):
+        headers = {'x-access-token': tokens[user]} if user else {}
+        latencies = []
+        statuses = Counter()
+        counter.total = 0
+        for i in range(requests):
+            method, url, payload = scenario(i)
+            started = time.perf_counter()
+            response = client.open(url, method=method, json=payload, headers=headers)
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[response.status_code] += 1
+        statuses = ' '.join(f'{status}x{total}' for status, total in sorted(statuses.items()))
+        print(f"{name:<34}{percentile(latencies, 50):>9.2f}{percentile(latencies, 95):>9.2f}"
+              f"{percentile(latencies, 99):>9.2f}{counter.total / requests:>9.1f}  {statuses}")
+
+    for connection in connections:
+        connection.set_trace_callback(None)
+    lookup.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every route of the appointment scheduler')
+    parser.add_argument('--requests', type=int, default=200, help='requests per route')
+    parser.add_argument('--months', type=int, default=3, help='months of seeded appointments')
+    parser.add_argument('--doctors', type=int, default=20, help='seeded doctors')
+    args = parser.parse_args()
+    run(args.requests, args.months, args.doctors)
+
+
+if __name__ == '__main__':
+    main()
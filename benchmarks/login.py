@@ -0,0 +1,84 @@
+"""
+    Login throughput benchmark
+
+    Fires concurrent POST /auth requests against a throw-away database for
+    every password hashing cost and reports the logins per second, the
+    p50/p95 latency and the logins rejected with 503 by the hashing queue
+
+    $ python -m benchmarks.login --logins 200 --clients 16
+"""
+import argparse
+import logging
+import os
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from app import create_app
+from app.db import init_db
+from benchmarks.endpoints import percentile
+
+
+HASH_METHODS = (
+    'pbkdf2:sha256:50000',
+    'pbkdf2:sha256:150000',
+    'pbkdf2:sha256:260000',
+    'pbkdf2:sha256:600000',
+)
+
+
+def build_app(database, method, workers, queue_size):
+    app = create_app({
+        'TESTING': True,
+        'DATABASE': database,
+        'JWT_SECRET': 'benchmark',
+        'PASSWORD_HASH_METHOD': method,
+        'PASSWORD_HASH_WORKERS': workers,
+        'PASSWORD_HASH_QUEUE_SIZE': queue_size,
+    })
+    with app.app_context():
+        init_db()
+
+    return app
+
+
+def login(app):
+    client = app.test_client()
+    started = time.perf_counter()
+    response = client.post('/auth', json={'username': 'scheduler1', 'password': 'scheduler1'})
+
+    return response.status_code, (time.perf_counter() - started) * 1000
+
+
+def run(logins, clients, workers, queue_size):
+    logging.disable(logging.CRITICAL)
+    print(f"{'method':<24}{'logins/s':>10}{'p50 ms':>9}{'p95 ms':>9}  statuses")
+    for method in HASH_METHODS:
+        app = build_app(os.path.join(tempfile.mkdtemp(), 'bench.db'), method, workers, queue_size)
+        # First login replaces the seeded plaintext password with a hash of this method
+        assert login(app)[0] == 200
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            results = list(executor.map(lambda _: login(app), range(logins)))
+        elapsed = time.perf_counter() - started
+
+        latencies = [latency for status, latency in results if status == 200]
+        statuses = Counter(status for status, _ in results)
+        statuses = ' '.join(f'{status}x{total}' for status, total in sorted(statuses.items()))
+        print(f"{method:<24}{len(latencies) / elapsed:>10.1f}{percentile(latencies, 50):>9.2f}"
+              f"{percentile(latencies, 95):>9.2f}  {statuses}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark logins per second at each password hashing cost')
+    parser.add_argument('--logins', type=int, default=200, help='logins per hashing method')
+    parser.add_argument('--clients', type=int, default=16, help='concurrent clients')
+    parser.add_argument('--workers', type=int, default=4, help='PASSWORD_HASH_WORKERS')
+    parser.add_argument('--queue-size', type=int, default=16, help='PASSWORD_HASH_QUEUE_SIZE')
+    args = parser.parse_args()
+    run(args.logins, args.clients, args.workers, args.queue_size)
+
+
+if __name__ == '__main__':
+    main()
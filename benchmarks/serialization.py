@@ -0,0 +1,100 @@
+"""
+    Micro-benchmark of listing serialization
+
+    Compares the default json provider with the orjson provider on a page
+    of appointments, as a list of row dicts, as models and in the columnar
+    format, then the time and memory of fetching the rows as dicts and as models
+
+    $ python -m benchmarks.serialization --rows 500
+"""
+import argparse
+import sqlite3
+import timeit
+import tracemalloc
+from datetime import datetime, timedelta
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from app.middleware.profiling import InstrumentedConnection
+from app.models import Appointment
+from app.utils.columnar import to_columnar
+from app.utils.json_provider import OrJSONProvider, orjson, to_json_default
+
+
+class JSONProvider(DefaultJSONProvider):
+    default = staticmethod(to_json_default)
+
+
+def build_rows(total):
+    # The app's connection class, whose cursors keep the column names of their statement
+    db = sqlite3.connect(':memory:', factory=InstrumentedConnection)
+    db.execute('CREATE TABLE appointments (id INTEGER PRIMARY KEY, schedule_time DATETIME, patient_name TEXT, '
+               'doctor_id INTEGER, comments TEXT, is_accepted BOOLEAN)')
+    start = datetime(2023, 5, 1, 9)
+    db.executemany('INSERT INTO appointments VALUES (?, ?, ?, ?, ?, ?)', [
+        (i, (start + timedelta(minutes=30 * i)).isoformat() + 'Z', f'patient{i}', i % 20, None, i % 2)
+        for i in range(1, total + 1)
+    ])
+    cursor = db.execute('SELECT * FROM appointments ORDER BY id')
+    tuples = cursor.fetchall()
+    columns = [column[0] for column in cursor.description]
+    db.row_factory = sqlite3.Row
+    rows = db.execute('SELECT * FROM appointments ORDER BY id').fetchall()
+
+    return db, columns, tuples, rows
+
+
+def fetch_dicts(db):
+    db.row_factory = sqlite3.Row
+    return [dict(row) for row in db.execute('SELECT * FROM appointments ORDER BY id')]
+
+
+def fetch_models(db):
+    db.row_factory = Appointment.row_factory
+    return db.execute('SELECT * FROM appointments ORDER BY id').fetchall()
+
+
+def peak_memory(func):
+    tracemalloc.start()
+    result = func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    del result
+
+    return peak
+
+
+def bench(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main(total, number):
+    app = Flask(__name__)
+    db, columns, tuples, rows = build_rows(total)
+    models = fetch_models(db)
+    providers = [('json', JSONProvider(app))]
+    if orjson is not None:
+        providers.append(('orjson', OrJSONProvider(app)))
+    else:
+        print('orjson is not installed, only the json module is measured')
+
+    print(f"{'provider':<10}{'format':<10}{'bytes':>10}{'us':>12}")
+    for name, provider in providers:
+        cases = (
+            ('rows', lambda: provider.dumps({'data': [dict(row) for row in rows]})),
+            ('models', lambda: provider.dumps({'data': models})),
+            ('columnar', lambda: provider.dumps({'data': to_columnar(columns, tuples)})),
+        )
+        for label, func in cases:
+            print(f"{name:<10}{label:<10}{len(func().encode('utf8')):>10}{bench(func, number):>12.1f}")
+
+    print(f"\n{'fetch':<20}{'us':>12}{'peak KiB':>12}")
+    for label, func in (('sqlite3.Row dicts', lambda: fetch_dicts(db)), ('models', lambda: fetch_models(db))):
+        print(f"{label:<20}{bench(func, number):>12.1f}{peak_memory(func) / 1024:>12.1f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark listing serialization')
+    parser.add_argument('--rows', type=int, default=500, help='rows per listing')
+    parser.add_argument('--number', type=int, default=200, help='serializations per measure')
+    args = parser.parse_args()
+    main(args.rows, args.number)
@@ -0,0 +1,52 @@
+"""
+    Micro-benchmark of request body validation
+
+    Compares jsonschema.validate, which checks the schema and builds a new
+    validator on every call, with the precompiled validators of app.utils.schema
+
+    $ python -m benchmarks.validation
+"""
+import timeit
+from jsonschema import validate, ValidationError
+from app.utils.schema import get_schema_error
+from app.appointment.validation import APPOINTMENT_SCHEMA
+from app.admin.validation import USER_SCHEMA
+
+
+CASES = (
+    ('appointment', APPOINTMENT_SCHEMA, 'valid', {
+        'schedule_time': '2023-05-01T10:00:00Z', 'patient_name': 'patient1', 'doctor_id': 3
+    }),
+    ('appointment', APPOINTMENT_SCHEMA, 'invalid', {
+        'schedule_time': '2023-05-01T10:00:00Z', 'patient_name': 1
+    }),
+    ('admin.user', USER_SCHEMA, 'valid', {
+        'username': 'doctor2', 'password': 'doctor2', 'level_id': 2,
+        'email': 'doctor2@gmail.com', 'full_name': 'Doctor Two', 'status': True
+    }),
+)
+
+
+def per_call_validate(schema, data):
+    try:
+        validate(instance=data, schema=schema)
+    except ValidationError as err:
+        return err.schema["error_msg"] if "error_msg" in err.schema else err.message
+
+
+def bench(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main(number=2000):
+    print(f"{'schema':<14}{'payload':<10}{'before (us)':>14}{'after (us)':>14}{'speedup':>10}")
+    for name, schema, label, data in CASES:
+        # Both paths must report the same error message
+        assert per_call_validate(schema, data) == get_schema_error(name, data)
+        before = bench(lambda: per_call_validate(schema, data), number)
+        after = bench(lambda: get_schema_error(name, data), number)
+        print(f"{name:<14}{label:<10}{before:>14.1f}{after:>14.1f}{before / after:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()